@@ -1,8 +1,13 @@
+import os
+import random
 import textwrap
 from argparse import (
     ArgumentParser,
     RawTextHelpFormatter,
 )
+from builder import BuildVariants
+from executors import ExecutorOptions
+from oracle import OracleEngines
 
 
 # https://stackoverflow.com/a/29485128
@@ -15,7 +20,9 @@ class TestingOptions:
     UNIT_TEST = "testit"
     GEN_CASES = "makeit"
     TIME_PROG = "timeit"
-    OPTIONS = {UNIT_TEST, GEN_CASES, TIME_PROG}
+    FUZZ_PROG = "fuzzit"
+    BENCH_PROG = "benchit"
+    OPTIONS = {UNIT_TEST, GEN_CASES, TIME_PROG, FUZZ_PROG, BENCH_PROG}
     DEFAULT = UNIT_TEST
 
     def __init__(self, opt: str) -> None:
@@ -42,6 +49,27 @@ class ArgsWrapper:
         self.__test_type = args.test_type
         self.__section = args.section
         self.__verbose = args.verbose
+        self.__jobs = args.jobs
+        self.__executor = args.executor
+        self.__fork_server = args.fork_server
+        self.__oracle = args.oracle
+        self.__shrink = args.shrink
+        self.__force = args.force
+        self.__cache = args.cache
+        self.__build_cache = args.build_cache
+        self.__cache_dir = args.cache_dir
+        self.__cache_max_size = args.cache_max_size
+        self.__cache_max_age = args.cache_max_age
+        self.__seed = args.seed
+        self.__iterations = args.iterations
+        self.__time_budget = args.time_budget
+        self.__variants = args.variants
+        self.__repeat = args.repeat
+        self.__stabilize = args.stabilize
+        self.__calibrate = args.calibrate
+        self.__compare_to = args.compare_to
+        self.__aslr = args.aslr
+        self.__warmup = args.warmup
         self.__args = args.args
 
     @property
@@ -56,6 +84,78 @@ class ArgsWrapper:
     def verbose(self) -> str:
         return self.__verbose
 
+    @property
+    def executor(self) -> str:
+        return self.__executor
+
+    @property
+    def fork_server(self) -> bool:
+        return self.__fork_server
+
+    @property
+    def oracle(self) -> str:
+        return self.__oracle
+
+    @property
+    def shrink(self) -> bool:
+        return self.__shrink
+
+    @property
+    def force(self) -> bool:
+        return self.__force
+
+    @property
+    def cache(self) -> bool:
+        return self.__cache
+
+    @property
+    def build_cache(self) -> bool:
+        return self.__build_cache
+
+    @property
+    def cache_options(self) -> dict:
+        return {
+            "cache_dir": self.__cache_dir,
+            "max_size": self.__cache_max_size * 1024 * 1024,
+            "max_age": self.__cache_max_age * 24 * 60 * 60,
+        }
+
+    @property
+    def execution(self) -> dict:
+        return {"jobs": self.__jobs, "executor": self.__executor}
+
+    @property
+    def fuzzing(self) -> dict:
+        return {
+            "seed": self.__seed,
+            "iterations": self.__iterations,
+            "time_budget": self.__time_budget,
+        }
+
+    @property
+    def variants(self) -> list[str]:
+        return self.__variants
+
+    @property
+    def stabilize(self) -> bool:
+        return self.__stabilize
+
+    @property
+    def aslr(self) -> bool:
+        return self.__aslr
+
+    @property
+    def calibrate(self) -> bool:
+        return self.__calibrate
+
+    @property
+    def compare_to(self) -> str:
+        return self.__compare_to
+
+    @property
+    def repetitions(self) -> dict:
+        return {"repeat": self.__repeat, "warmup": self.__warmup}
+
     @property
     def arguments(self) -> list[str]:
         return self.__args
@@ -79,6 +179,8 @@ def getArguments(*args: str) -> ArgsWrapper:
                 - {TestingOptions.UNIT_TEST}: runs each program against the expected output and shows a diff.
                 - {TestingOptions.GEN_CASES}: runs each program and prints the output in a markdown unit test report.
                 - {TestingOptions.TIME_PROG}: runs each program as-is, prints the output, and times it.
+                - {TestingOptions.FUZZ_PROG}: runs random workloads against the reference scheduler and prints the ones that differ.
+                - {TestingOptions.BENCH_PROG}: builds each program in several ways, then tests and times every build side by side.
             """
         ),
     )
@@ -91,6 +193,235 @@ def getArguments(*args: str) -> ArgsWrapper:
         action="store_true",
         help="If present testing mode will show the passed cases too.",
     )
+    arg_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help=textwrap.dedent(
+            f"""\
+            Number of sections to run at the same time. Defaults to the number of CPUs,
+            except for {TestingOptions.TIME_PROG} and {TestingOptions.BENCH_PROG} which default to 1 so timings are
+            not skewed.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "-e",
+        "--executor",
+        default=ExecutorOptions.DEFAULT,
+        choices=ExecutorOptions.OPTIONS,
+        help=textwrap.dedent(
+            f"""\
+            How the runs of your program are spawned. The options are:
+                - {ExecutorOptions.THREAD}: each run waits on its own worker thread.
+                - {ExecutorOptions.ASYNCIO}: all runs are driven from a single asyncio event loop.
+            Both give the same report. At most JOBS runs are in flight at any time.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--fork-server",
+        action="store_true",
+        help=textwrap.dedent(
+            """\
+            Link your program behind a small fork server that is started once and forks
+            a fresh copy of it for every run, skipping exec and dynamic linking per run.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--oracle",
+        nargs="?",
+        const=OracleEngines.DEFAULT,
+        choices=OracleEngines.OPTIONS,
+        help=textwrap.dedent(
+            f"""\
+            Use the built-in reference round robin scheduler instead of your program. Nothing
+            is built or spawned, which is handy to make expected results with {TestingOptions.GEN_CASES}.
+            The engine defaults to {OracleEngines.DEFAULT}. The options are:
+                - {OracleEngines.PYTHON}: simulates one quantum at a time.
+                - {OracleEngines.NUMPY}: simulates every quantum of a section at once (needs numpy).
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--force",
+        action="store_true",
+        help=textwrap.dedent(
+            f"""\
+            Run every section in {TestingOptions.UNIT_TEST}. By default sections that passed before
+            are skipped as long as neither them, your compiled program nor the extra
+            arguments changed.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--shrink",
+        action="store_true",
+        help=textwrap.dedent(
+            f"""\
+            When a section fails in {TestingOptions.UNIT_TEST} or {TestingOptions.FUZZ_PROG}, look for the smallest
+            payload your program still gets wrong by removing processes and lowering
+            arrivals and bursts, and print it as a section. It is checked against the
+            built-in reference scheduler, several candidates at a time.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--cache",
+        action="store_true",
+        help=textwrap.dedent(
+            f"""\
+            Reuse the output of previous runs when the compiled program, the payload, the
+            quantum and the extra arguments are all the same. It does not apply to
+            {TestingOptions.TIME_PROG}. The report shows how many runs were reused.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--no-build-cache",
+        dest="build_cache",
+        action="store_false",
+        help=textwrap.dedent(
+            """\
+            Build your program in a temporary directory of its own that is removed when
+            the tester exits, instead of reusing a build from the cache directory.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--cache-dir",
+        default=".rrcache",
+        help=textwrap.dedent(
+            """\
+            Directory where the tester keeps its caches. Defaults to .rrcache. The parsed
+            test file is always cached there and is parsed again only when it changes.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--cache-max-size",
+        type=int,
+        default=64,
+        metavar="MB",
+        help="Cached outputs are evicted oldest first beyond this size. Defaults to 64.",
+    )
+    arg_parser.add_argument(
+        "--cache-max-age",
+        type=float,
+        default=30,
+        metavar="DAYS",
+        help="Cached outputs not used for this many days are evicted. Defaults to 30.",
+    )
+    arg_parser.add_argument(
+        "--seed",
+        type=int,
+        help=textwrap.dedent(
+            f"""\
+            Seed of the workloads made by {TestingOptions.FUZZ_PROG}. A random one is picked and
+            shown in the report if not given, pass it again to get the same workloads.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--iterations",
+        type=int,
+        help=textwrap.dedent(
+            f"""\
+            Number of workloads tried by {TestingOptions.FUZZ_PROG}. Defaults to 1000 unless a
+            time budget is given.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--time-budget",
+        type=float,
+        metavar="SECONDS",
+        help=f"Stop making workloads for {TestingOptions.FUZZ_PROG} after this many seconds.",
+    )
+    arg_parser.add_argument(
+        "--repeat",
+        type=int,
+        metavar="N",
+        help=textwrap.dedent(
+            f"""\
+            Time every quantum of {TestingOptions.TIME_PROG} this many times. Defaults to 1. With more
+            than one run, each section also shows the min, median, mean, 95th percentile,
+            standard deviation, a bootstrapped 95%% confidence interval of the mean, and
+            the number of outliers of its timings.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--warmup",
+        type=int,
+        metavar="K",
+        help=textwrap.dedent(
+            f"""\
+            Run every quantum of {TestingOptions.TIME_PROG} this many times before timing it, so page
+            cache and branch predictors are warm. Defaults to 0.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help=textwrap.dedent(
+            f"""\
+            Before {TestingOptions.TIME_PROG} runs the suite, time a program that does nothing and your
+            program on a payload without processes, the same way the suite is timed. The
+            report then also shows the timings less the overhead of the tester.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--compare-to",
+        metavar="REF",
+        help=textwrap.dedent(
+            f"""\
+            Every {TestingOptions.TIME_PROG} run is kept in a history in the cache directory. Compare
+            this run with an earlier one, exiting with status 1 if the sections got
+            significantly slower overall. REF is the number of a run, the start of the
+            hash of its rr.c, or "last" for the previous run on this host. The last two
+            only pick runs timed with the same options as this one.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--stabilize",
+        action="store_true",
+        help=textwrap.dedent(
+            f"""\
+            Make timings of {TestingOptions.TIME_PROG} and {TestingOptions.BENCH_PROG} steadier: the tester and every run of your
+            program it starts are pinned to the last CPU the tester may use and get a
+            higher priority when the system allows it. Runs share that CPU, so it needs
+            -j 1. The report warns when that CPU does not run the performance frequency
+            governor. Linux only.
+            """
+        ),
+    )
+    arg_parser.add_argument(
+        "--no-aslr",
+        dest="aslr",
+        action="store_false",
+        help="With --stabilize, also disable address space randomization of your program.",
+    )
+    arg_parser.add_argument(
+        "--variants",
+        nargs="+",
+        default=list(BuildVariants.DEFAULT),
+        choices=BuildVariants.OPTIONS,
+        help=textwrap.dedent(
+            f"""\
+            Builds compared by {TestingOptions.BENCH_PROG}, all of them by default. The options are:
+                - {BuildVariants.O0}: the flags in the Makefile, without optimizations.
+                - {BuildVariants.O2}: optimized with -O2.
+                - {BuildVariants.O3_NATIVE}: optimized with -O3 for the CPU it is built on.
+                - {BuildVariants.ASAN}: AddressSanitizer, reports memory errors and leaks.
+                - {BuildVariants.UBSAN}: UndefinedBehaviorSanitizer, stops at undefined behavior.
+            """
+        ),
+    )
     arg_parser.add_argument(
         "--args",
         nargs="+",
@@ -112,4 +443,89 @@ def getArguments(*args: str) -> ArgsWrapper:
     p_args.section = set(p_args.section) if p_args.section else set()
     p_args.args = p_args.args if p_args.args else []
 
+    if p_args.oracle and p_args.fork_server:
+        arg_parser.error("argument --oracle: not allowed with argument --fork-server")
+
+    if p_args.test_type == TestingOptions.FUZZ_PROG:
+        if p_args.oracle:
+            arg_parser.error("argument --oracle: not allowed with fuzzit")
+        if p_args.section:
+            arg_parser.error("argument -s/--section: not allowed with fuzzit")
+        if p_args.seed is None:
+            p_args.seed = random.SystemRandom().randrange(1 << 32)
+        if p_args.iterations is None and p_args.time_budget is None:
+            p_args.iterations = 1000
+
+    if p_args.test_type == TestingOptions.BENCH_PROG and p_args.oracle:
+        arg_parser.error(
+            f"argument --oracle: not allowed with {TestingOptions.BENCH_PROG}"
+        )
+
+    if p_args.test_type != TestingOptions.TIME_PROG:
+        if p_args.repeat is not None:
+            arg_parser.error(
+                f"argument --repeat: only allowed with {TestingOptions.TIME_PROG}"
+            )
+        if p_args.warmup is not None:
+            arg_parser.error(
+                f"argument --warmup: only allowed with {TestingOptions.TIME_PROG}"
+            )
+
+    if p_args.calibrate:
+        if p_args.test_type != TestingOptions.TIME_PROG:
+            arg_parser.error(
+                f"argument --calibrate: only allowed with {TestingOptions.TIME_PROG}"
+            )
+        if p_args.oracle:
+            arg_parser.error("argument --oracle: not allowed with argument --calibrate")
+
+    if p_args.compare_to is not None:
+        if p_args.test_type != TestingOptions.TIME_PROG:
+            arg_parser.error(
+                f"argument --compare-to: only allowed with {TestingOptions.TIME_PROG}"
+            )
+        if p_args.oracle:
+            arg_parser.error(
+                "argument --oracle: not allowed with argument --compare-to"
+            )
+
+    if p_args.stabilize:
+        if p_args.test_type not in (
+            TestingOptions.TIME_PROG,
+            TestingOptions.BENCH_PROG,
+        ):
+            arg_parser.error(
+                "argument --stabilize: only allowed with"
+                f" {TestingOptions.TIME_PROG} or {TestingOptions.BENCH_PROG}"
+            )
+        if p_args.oracle:
+            arg_parser.error("argument --oracle: not allowed with argument --stabilize")
+    elif not p_args.aslr:
+        arg_parser.error("argument --no-aslr: only allowed with argument --stabilize")
+
+    p_args.repeat = 1 if p_args.repeat is None else p_args.repeat
+    p_args.warmup = 0 if p_args.warmup is None else p_args.warmup
+    if p_args.repeat < 1:
+        arg_parser.error("argument --repeat: must be at least 1")
+    if p_args.warmup < 0:
+        arg_parser.error("argument --warmup: must not be negative")
+
+    if p_args.iterations is not None and p_args.iterations < 1:
+        arg_parser.error("argument --iterations: must be at least 1")
+    if p_args.time_budget is not None and p_args.time_budget <= 0:
+        arg_parser.error("argument --time-budget: must be positive")
+
+    if p_args.jobs is None:
+        timing = p_args.test_type in (
+            TestingOptions.TIME_PROG,
+            TestingOptions.BENCH_PROG,
+        )
+        p_args.jobs = 1 if timing else os.cpu_count() or 1
+    elif p_args.jobs < 1:
+        arg_parser.error("argument -j/--jobs: must be at least 1")
+
+    if p_args.stabilize and p_args.jobs > 1:
+        # every run is pinned to the same CPU, concurrent ones would wait on it
+        arg_parser.error("argument --stabilize: not allowed with -j/--jobs above 1")
+
     return ArgsWrapper(p_args)
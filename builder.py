@@ -0,0 +1,124 @@
+import os
+import glob
+import time
+import shutil
+import tempfile
+import subprocess
+from resultcache import file_digest, parts_digest
+
+
+class BuildVariants:
+    O0 = "O0"
+    O2 = "O2"
+    O3_NATIVE = "O3-native"
+    ASAN = "asan"
+    UBSAN = "ubsan"
+    OPTIONS = (O0, O2, O3_NATIVE, ASAN, UBSAN)  # in the order they are shown
+    DEFAULT = OPTIONS
+
+    # make variables of each variant, on top of the flags in the Makefile
+    VARIABLES = {
+        O0: {},
+        O2: {"EXTRA_CFLAGS": "-O2"},
+        O3_NATIVE: {"EXTRA_CFLAGS": "-O3 -march=native"},
+        ASAN: {
+            "EXTRA_CFLAGS": "-O1 -g -fsanitize=address -fno-omit-frame-pointer",
+            "EXTRA_LDFLAGS": "-fsanitize=address",
+        },
+        UBSAN: {
+            "EXTRA_CFLAGS": "-O2 -g -fsanitize=undefined -fno-sanitize-recover=all",
+            "EXTRA_LDFLAGS": "-fsanitize=undefined",
+        },
+    }
+
+
+class BuildCache:
+    """Builds make targets out of tree and keeps the results around.
+
+    The Makefile and the C sources and headers next to it are copied to a
+    scratch directory, which is where make runs, so nothing is written to or
+    removed from the source tree. Builds are named after the hash of those
+    copies, the version of the compiler, the target and the make variables it
+    is built with, and a finished build is renamed into place under that
+    name. Testers sharing the cache never see half a build and the first one
+    to finish wins. Only the MAX_BUILDS most recently used builds are kept,
+    and scratch directories left behind by killed testers are removed after
+    MAX_SCRATCH_AGE seconds.
+    """
+
+    MAX_BUILDS = 16
+    MAX_SCRATCH_AGE = 60 * 60
+    SOURCES = ("Makefile", "*.c", "*.h")
+
+    def __init__(self, cache_dir: str, src_dir: str = ".") -> None:
+        self.__dir = os.path.abspath(os.path.join(cache_dir, "builds"))
+        self.__src_dir = os.path.abspath(src_dir)
+
+    def __compiler_version(self) -> str:
+        compiler = os.environ.get("CC", "cc")
+        try:
+            return subprocess.run(
+                (compiler, "--version"), capture_output=True, text=True
+            ).stdout
+        except OSError:
+            return ""  # make will complain about it soon enough
+
+    def __copy_sources(self, dest: str) -> list[str]:
+        names = set()
+        for pattern in BuildCache.SOURCES:
+            for path in glob.glob(os.path.join(self.__src_dir, pattern)):
+                shutil.copy2(path, dest)
+                names.add(os.path.basename(path))
+        return sorted(names)
+
+    def key(
+        self, src_dir: str, sources: list[str], target: str, variables: dict = {}
+    ) -> str:
+        parts = [target.encode(), self.__compiler_version().encode()]
+        parts.extend(f"{k}={v}".encode() for k, v in sorted(variables.items()))
+        for name in sources:
+            digest = file_digest(os.path.join(src_dir, name))
+            parts.extend((name.encode(), digest.encode()))
+        return parts_digest("build", *parts)
+
+    def build(self, target: str, variables: dict = {}) -> str:
+        """Returns the absolute path of target, building it with the given
+        make variables if needed."""
+        os.makedirs(self.__dir, exist_ok=True)
+        scratch = tempfile.mkdtemp(prefix="tmp-", dir=self.__dir)
+
+        try:
+            sources = self.__copy_sources(scratch)
+            key = self.key(scratch, sources, target, variables)
+            build_dir = os.path.join(self.__dir, key)
+            binary = os.path.join(build_dir, target)
+
+            if not os.path.exists(binary):
+                assignments = [f"{k}={v}" for k, v in variables.items()]
+                subprocess.check_output(("make", "-C", scratch, *assignments, target))
+                try:
+                    os.rename(scratch, build_dir)
+                except OSError:
+                    if not os.path.exists(binary):
+                        raise  # not a build that finished first
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        os.utime(build_dir)
+        self.evict()
+        return binary
+
+    def evict(self):
+        builds = []
+        deadline = time.time() - BuildCache.MAX_SCRATCH_AGE
+        for entry in os.scandir(self.__dir):
+            if not entry.is_dir():
+                continue
+            if not entry.name.startswith("tmp-"):
+                builds.append((entry.stat().st_mtime, entry.path))
+            elif entry.stat().st_mtime < deadline:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+        builds.sort(reverse=True)
+        for _, path in builds[BuildCache.MAX_BUILDS :]:
+            shutil.rmtree(path, ignore_errors=True)
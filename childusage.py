@@ -0,0 +1,85 @@
+import os
+import sys
+import resource
+import threading
+import subprocess
+
+
+def kilobytes(maxrss: int) -> int:
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return maxrss // 1024 if sys.platform == "darwin" else maxrss
+
+
+class ChildUsage:
+    """Resources used by runs of the program. Max RSS is in kilobytes and is
+    None when it cannot be told apart from the one of other children."""
+
+    __slots__ = ("user", "sys", "maxrss", "minflt", "majflt", "nvcsw", "nivcsw")
+
+    def __init__(self, user, sys, maxrss, minflt, majflt, nvcsw, nivcsw) -> None:
+        self.user = user
+        self.sys = sys
+        self.maxrss = maxrss
+        self.minflt = minflt
+        self.majflt = majflt
+        self.nvcsw = nvcsw
+        self.nivcsw = nivcsw
+
+    @classmethod
+    def from_rusage(cls, usage):
+        return cls(
+            usage.ru_utime,
+            usage.ru_stime,
+            kilobytes(usage.ru_maxrss),
+            usage.ru_minflt,
+            usage.ru_majflt,
+            usage.ru_nvcsw,
+            usage.ru_nivcsw,
+        )
+
+    @classmethod
+    def children(cls):
+        return cls.from_rusage(resource.getrusage(resource.RUSAGE_CHILDREN))
+
+    def since(self, before: "ChildUsage") -> "ChildUsage":
+        """Usage of the children reaped between before and this one. The max
+        RSS of all children is not a sum, so it is unknown unless it grew."""
+        return ChildUsage(
+            self.user - before.user,
+            self.sys - before.sys,
+            self.maxrss if self.maxrss > before.maxrss else None,
+            self.minflt - before.minflt,
+            self.majflt - before.majflt,
+            self.nvcsw - before.nvcsw,
+            self.nivcsw - before.nivcsw,
+        )
+
+
+_last = threading.local()
+
+
+def check_output(cmd: tuple) -> bytes:
+    """Same as subprocess.check_output, but reaps the child with os.wait4 to
+    keep its resource usage for the calling thread to take()."""
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+        stdout = proc.stdout.read()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+    keep(ChildUsage.from_rusage(usage))
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stdout)
+    return stdout
+
+
+def keep(usage: ChildUsage):
+    """Hands the usage of a run made in this thread over to take()."""
+    _last.usage = usage
+
+
+def take():
+    """Returns the usage of the last run kept in this thread and forgets it,
+    or None if there is none."""
+    usage = getattr(_last, "usage", None)
+    _last.usage = None
+    return usage
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ExecutorOptions:
+    THREAD = "thread"
+    ASYNCIO = "asyncio"
+    OPTIONS = {THREAD, ASYNCIO}
+    DEFAULT = THREAD
+
+
+class AsyncioExecutor:
+    """Runs coroutine functions on an event loop owned by a background thread.
+
+    Only `max_workers` coroutines are allowed to run at the same time. The
+    returned futures are regular concurrent futures so callers can block on
+    them from any thread, just like with a ThreadPoolExecutor.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+        self.__thread.start()
+        self.__limit = self.__call_soon(self.__make_limit(max_workers)).result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    async def __make_limit(self, max_workers: int):
+        # semaphores bind to the running loop on older pythons
+        return asyncio.Semaphore(max_workers)
+
+    async def __guarded(self, fn, *args):
+        async with self.__limit:
+            return await fn(*args)
+
+    def __call_soon(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.__loop)
+
+    def submit(self, fn, *args) -> Future:
+        if not asyncio.iscoroutinefunction(fn):
+            raise TypeError(f"{fn!r} is not a coroutine function")
+        return self.__call_soon(self.__guarded(fn, *args))
+
+    def shutdown(self, wait: bool = True):
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        if wait:
+            self.__thread.join()
+            self.__loop.close()
+
+
+def make_executor(kind: str, max_workers: int):
+    if kind == ExecutorOptions.THREAD:
+        return ThreadPoolExecutor(max_workers=max_workers)
+    elif kind == ExecutorOptions.ASYNCIO:
+        return AsyncioExecutor(max_workers)
+    else:
+        raise ValueError(f"'{kind}' is not a valid executor")
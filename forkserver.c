@@ -0,0 +1,195 @@
+/*
+ * Fork server for rr.c
+ *
+ * rr.c is compiled with -Dmain=rr_main and linked against this file. The
+ * server is started once by the tester and then forks a fresh child per
+ * request, so every run starts from the pristine state of a freshly loaded
+ * program without paying for exec and dynamic linking again.
+ *
+ * Requests arrive on stdin as the number of arguments followed by one
+ * argument per line:
+ *
+ *     2\n
+ *     /tmp/payload\n
+ *     5\n
+ *
+ * Each reply on stdout is a header with the exit status (negative signal
+ * number if the child was killed), the byte count of what the child printed
+ * and the resources the child used as reported by wait4 (user and system
+ * CPU in microseconds, max RSS, minor and major page faults, voluntary and
+ * involuntary context switches), followed by the bytes printed:
+ *
+ *     0 58 812 143 1480 92 0 1 3\n
+ *     Average waiting time: ...
+ */
+#include <errno.h>
+#include <fcntl.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+#define MAX_ARGS 64
+#define MAX_LINE 4096
+
+int rr_main(int argc, char *argv[]);
+
+static int write_all(int fd, const char *buf, size_t len)
+{
+	while (len > 0) {
+		ssize_t n = write(fd, buf, len);
+		if (n < 0) {
+			if (errno == EINTR)
+				continue;
+			return -1;
+		}
+		buf += n;
+		len -= (size_t)n;
+	}
+	return 0;
+}
+
+static char *read_child(int fd, size_t *len)
+{
+	size_t cap = 4096;
+	char *buf = malloc(cap);
+
+	*len = 0;
+	while (buf != NULL) {
+		ssize_t n;
+
+		if (*len == cap) {
+			char *grown = realloc(buf, cap * 2);
+			if (grown == NULL) {
+				free(buf);
+				return NULL;
+			}
+			buf = grown;
+			cap *= 2;
+		}
+
+		n = read(fd, buf + *len, cap - *len);
+		if (n < 0 && errno == EINTR)
+			continue;
+		if (n <= 0)
+			break;
+		*len += (size_t)n;
+	}
+
+	return buf;
+}
+
+static void run_child(int out_fd, int argc, char *argv[])
+{
+	int devnull = open("/dev/null", O_RDONLY);
+
+	if (devnull >= 0) {
+		dup2(devnull, STDIN_FILENO);
+		close(devnull);
+	}
+	dup2(out_fd, STDOUT_FILENO);
+	close(out_fd);
+
+	exit(rr_main(argc, argv));
+}
+
+static int serve(int argc, char *argv[])
+{
+	int fds[2];
+	int status;
+	pid_t pid;
+	size_t len;
+	char *out;
+	char header[256];
+	int hlen;
+	struct rusage ru;
+
+	if (pipe(fds) < 0)
+		return -1;
+
+	pid = fork();
+	if (pid < 0) {
+		close(fds[0]);
+		close(fds[1]);
+		return -1;
+	}
+	if (pid == 0) {
+		close(fds[0]);
+		run_child(fds[1], argc, argv);
+	}
+
+	close(fds[1]);
+	out = read_child(fds[0], &len);
+	close(fds[0]);
+
+	while (wait4(pid, &status, 0, &ru) < 0) {
+		if (errno != EINTR) {
+			free(out);
+			return -1;
+		}
+	}
+
+	if (WIFSIGNALED(status))
+		status = -WTERMSIG(status);
+	else
+		status = WEXITSTATUS(status);
+
+	if (out == NULL)
+		return -1;
+
+	hlen = snprintf(header, sizeof(header), "%d %zu %ld %ld %ld %ld %ld %ld %ld\n",
+			status, len,
+			(long)ru.ru_utime.tv_sec * 1000000 + (long)ru.ru_utime.tv_usec,
+			(long)ru.ru_stime.tv_sec * 1000000 + (long)ru.ru_stime.tv_usec,
+			ru.ru_maxrss, ru.ru_minflt, ru.ru_majflt, ru.ru_nvcsw,
+			ru.ru_nivcsw);
+	if (write_all(STDOUT_FILENO, header, (size_t)hlen) < 0 ||
+	    write_all(STDOUT_FILENO, out, len) < 0) {
+		free(out);
+		return -1;
+	}
+
+	free(out);
+	return 0;
+}
+
+int main(int argc, char *argv[])
+{
+	char line[MAX_LINE];
+	char *args[MAX_ARGS + 2];
+	int nargs;
+	int i;
+
+	(void)argc;
+
+	while (fgets(line, sizeof(line), stdin) != NULL) {
+		nargs = atoi(line);
+		if (nargs < 0 || nargs > MAX_ARGS) {
+			fprintf(stderr, "forkserver: bad argument count %d\n", nargs);
+			return 1;
+		}
+
+		args[0] = argv[0];
+		for (i = 1; i <= nargs; ++i) {
+			if (fgets(line, sizeof(line), stdin) == NULL) {
+				fprintf(stderr, "forkserver: truncated request\n");
+				return 1;
+			}
+			line[strcspn(line, "\n")] = '\0';
+			args[i] = strdup(line);
+		}
+		args[nargs + 1] = NULL;
+
+		if (serve(nargs + 1, args) < 0) {
+			perror("forkserver");
+			return 1;
+		}
+
+		for (i = 1; i <= nargs; ++i)
+			free(args[i]);
+	}
+
+	return 0;
+}
@@ -0,0 +1,102 @@
+import os
+import queue
+import subprocess
+import threading
+import childusage
+from childusage import ChildUsage, kilobytes
+
+
+class ForkServer:
+    """Client for a single rr fork server process. See forkserver.c for the
+    wire format."""
+
+    def __init__(self, prog_name: str) -> None:
+        self.__proc = subprocess.Popen(
+            (prog_name,), stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+
+    @property
+    def alive(self) -> bool:
+        return self.__proc.poll() is None
+
+    def run(self, *args: str) -> tuple[int, bytes, ChildUsage]:
+        request = [str(len(args))] + [str(a) for a in args]
+        if any("\n" in a for a in request):
+            raise ValueError("fork server arguments cannot contain new lines")
+
+        self.__proc.stdin.write(("\n".join(request) + "\n").encode())
+        self.__proc.stdin.flush()
+
+        header = self.__proc.stdout.readline().split()
+        if len(header) != 9:
+            raise subprocess.SubprocessError("fork server stopped responding")
+
+        status, size, user, sys, maxrss, *counts = (int(h) for h in header)
+        output = self.__proc.stdout.read(size)
+        if len(output) != size:
+            raise subprocess.SubprocessError("fork server sent a truncated reply")
+
+        usage = ChildUsage(user / 1e6, sys / 1e6, kilobytes(maxrss), *counts)
+        return (status, output, usage)
+
+    def close(self):
+        if self.__proc.stdin:
+            self.__proc.stdin.close()
+        self.__proc.wait()
+        self.__proc.stdout.close()
+
+
+class ForkServerPool:
+    """Callback compatible with project_callback that hands runs to up to
+    `size` fork servers, each one serving a single run at a time."""
+
+    def __init__(self, prog_name: str, size: int) -> None:
+        self.__prog_name = os.path.abspath(prog_name)
+        self.__idle: queue.Queue = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__servers: list[ForkServer] = []
+        self.__size = size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __acquire(self) -> ForkServer:
+        with self.__lock:
+            if self.__idle.empty() and len(self.__servers) < self.__size:
+                server = ForkServer(self.__prog_name)
+                self.__servers.append(server)
+                return server
+        return self.__idle.get()
+
+    def __release(self, server: ForkServer):
+        if not server.alive:
+            # replace dead servers so later runs are not starved
+            with self.__lock:
+                self.__servers.remove(server)
+                server = ForkServer(self.__prog_name)
+                self.__servers.append(server)
+        self.__idle.put(server)
+
+    def __call__(self, filename: str, q_size: str, *args):
+        cmd = (self.__prog_name, filename, q_size, *args)
+        server = self.__acquire()
+
+        try:
+            status, output, usage = server.run(*cmd[1:])
+        finally:
+            self.__release(server)
+
+        childusage.keep(usage)
+        if status:
+            raise subprocess.CalledProcessError(status, cmd, output)
+
+        return output.decode()
+
+    def close(self):
+        with self.__lock:
+            for server in self.__servers:
+                server.close()
+            self.__servers.clear()
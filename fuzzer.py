@@ -0,0 +1,108 @@
+import time
+import random
+import itertools
+from array import array
+import oracle
+from unittester import PrintableReport, Section, TesterBase
+
+
+class FuzzReport(PrintableReport):
+    def __init__(self, seed: int) -> None:
+        super().__init__("fuzzit")
+        self.__seed = seed
+        self.__entries = []
+
+    def add_entry(self, passed: bool) -> None:
+        self.__entries.append(passed)
+
+    def print_report(self):
+        failed = self.__entries.count(False)
+        COLSIZE = 8
+        out_report = []
+        out_report.append(f"{'seed:':<{COLSIZE}}{self.__seed}")
+        out_report.append(f"{'cases:':<{COLSIZE}}{len(self.__entries)}")
+        out_report.append(f"{'failed:':<{COLSIZE}}{failed}")
+        out_report.extend(self.format_notes(COLSIZE))
+        out_report[-1] += "\n"
+        super().print_report(out_report)
+
+
+class FuzzTester(TesterBase):
+    """Runs random workloads through the program and through the reference
+    scheduler in oracle.py. Cases where they disagree are printed as sections
+    that can be pasted into the test file, with the reference results as the
+    expected ones and the disagreement as a quote above the payload.
+
+    Case i of a seed is always the same workload, so a run is reproduced by
+    passing the seed it reports. Generation stops at the iteration budget or
+    once the time budget is spent, whichever comes first.
+    """
+
+    MAX_PROCESSES = 20
+
+    def __init__(
+        self,
+        callback,
+        *args,
+        seed: int,
+        iterations: int = None,
+        time_budget: float = None,
+        suite_cache_dir=None,  # there is no suite to cache
+        **options,
+    ):
+        super().__init__("fuzzit", callback, *args, **options)
+        self.__seed = seed
+        self.__iterations = iterations
+        self.__time_budget = time_budget
+        self.result = FuzzReport(seed)
+
+    def iter_sections(self, section_filter: set[str] = set()):
+        started = time.monotonic()
+        for i in itertools.count():
+            if self.__iterations is not None and i >= self.__iterations:
+                return
+            if self.__time_budget is not None:
+                if time.monotonic() - started >= self.__time_budget:
+                    return
+            yield (f"## Fuzz {self.__seed}-{i}", self.make_case(i))
+
+    def make_case(self, i: int) -> Section:
+        rng = random.Random(f"{self.__seed}-{i}")
+        count = rng.randint(1, FuzzTester.MAX_PROCESSES)
+
+        # a narrow spread gives ties and bursts of arrivals, a wide one idle gaps
+        spread = rng.choice((0, 10, 100, 1000))
+        longest = rng.choice((1, 10, 100))
+        arrivals = [rng.randint(0, spread) for _ in range(count)]
+        bursts = [rng.randint(1, longest) for _ in range(count)]
+
+        payload = [str(count)]
+        payload.extend(
+            f"{p}, {a}, {b}" for p, a, b in zip(itertools.count(1), arrivals, bursts)
+        )
+
+        longest = max(bursts)
+        quanta = {1, 2, longest, longest + 1}
+        quanta.update(rng.randint(1, longest + 1) for _ in range(4))
+        generator = ",".join(str(q) for q in sorted(quanta))
+
+        blob = "".join(s + "\n" for s in payload).encode()
+        return Section(blob, (), array("d"), array("d"), (generator,))
+
+    def run_section(self, unit: Section):
+        processes = oracle.parse_payload(unit.payload.decode())
+        outcomes = self.run_payload(unit.payload, unit.sweep)
+        results, differ = self.compare_with_reference(processes, unit.sweep, outcomes)
+        passed_all = not differ
+
+        prog_out: list[str] = []
+        if differ and self.shrink:
+            prog_out = self.shrink_payload(unit.payload, unit.sweep)
+
+        if not prog_out:
+            prog_out = self.make_section_lines(
+                unit.payload_lines(), results, list(unit.generator), differ
+            )
+
+        self.result.add_entry(passed_all)
+        return (passed_all, prog_out)
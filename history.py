@@ -0,0 +1,241 @@
+import os
+import math
+import time
+import contextlib
+import sqlite3
+import statistics
+import threading
+from timingstats import signed_rank_p_value
+from unittester import PrintableReport, TesterBase
+
+
+class BenchHistory:
+    """Every timeit run and its timings, kept in a SQLite database.
+
+    A run is identified by the hash of rr.c, the hash of the binary it was
+    built into, which changes with the compiler and the flags in the
+    Makefile, the host and the options that change how runs are timed, and
+    is only compared by default with runs timed with the same options. Each
+    timed run of a quantum is a row of its section. Timings are kept in
+    memory and written in one transaction once the whole run is, so
+    interrupted runs leave nothing and testers running at the same time
+    only hold the database for as long as that takes.
+    """
+
+    FILENAME = "history.sqlite3"
+    TIMEOUT = 30
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            started REAL NOT NULL,
+            host TEXT NOT NULL,
+            source TEXT NOT NULL,
+            build TEXT NOT NULL,
+            options TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS timings (
+            run INTEGER NOT NULL REFERENCES runs (id),
+            section TEXT NOT NULL,
+            quantum TEXT NOT NULL,
+            seconds REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS timings_by_run ON timings (run, section, quantum);
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        self.__path = os.path.join(cache_dir, BenchHistory.FILENAME)
+        self.__lock = threading.Lock()
+        self.__run = None
+        self.__samples: dict[tuple, list[float]] = dict()
+        self.run_id = None
+        self.host = None
+        self.options = None
+
+    def __connect(self):
+        db = sqlite3.connect(self.__path, timeout=BenchHistory.TIMEOUT)
+        try:
+            db.executescript(BenchHistory.SCHEMA)
+        except sqlite3.Error:
+            db.close()
+            raise
+        return contextlib.closing(db)
+
+    def start_run(self, host: str, source: str, build: str, options: str):
+        self.__run = (time.time(), host, source, build, options)
+        self.host = host
+        self.options = options
+
+    def add_timings(self, section: str, quantum: str, samples: list[float]):
+        with self.__lock:
+            self.__samples.setdefault((section, quantum), []).extend(samples)
+
+    def save(self):
+        """Writes the run and its timings, and returns None or the error that
+        kept them out of the database, such as it staying locked."""
+        try:
+            with self.__connect() as db, db:
+                cursor = db.execute(
+                    "INSERT INTO runs (started, host, source, build, options)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    self.__run,
+                )
+                db.executemany(
+                    "INSERT INTO timings (run, section, quantum, seconds)"
+                    " VALUES (?, ?, ?, ?)",
+                    [
+                        (cursor.lastrowid, section, quantum, s)
+                        for (section, quantum), samples in self.__samples.items()
+                        for s in samples
+                    ],
+                )
+                self.run_id = cursor.lastrowid
+        except sqlite3.Error as err:
+            return err
+        return None
+
+    def find_run(self, ref: str):
+        """Returns the row of the run ref names, or None. ref is a run id,
+        `last` for the latest run on this host before the current one, or the
+        start of the rr.c hash of a run, which picks the latest with it. The
+        last two only pick runs timed with the same options as this one."""
+        query = "SELECT * FROM runs WHERE id IS NOT ? AND "
+        if ref == "last":
+            query += "host = ? AND options = ?"
+            params = (self.run_id, self.host, self.options)
+        elif ref.isdigit():
+            query += "id = ?"
+            params = (self.run_id, int(ref))
+        else:
+            query += "source LIKE ? AND options = ?"
+            params = (self.run_id, ref.lower() + "%", self.options)
+
+        with self.__connect() as db:
+            return db.execute(query + " ORDER BY id DESC", params).fetchone()
+
+    def timings(self, run_id: int = None) -> dict[tuple, list[float]]:
+        """Samples of a run by (section, quantum), the current one if None."""
+        if run_id is None:
+            return self.__samples
+
+        samples: dict[tuple, list[float]] = dict()
+        with self.__connect() as db:
+            rows = db.execute(
+                "SELECT section, quantum, seconds FROM timings WHERE run = ?",
+                (run_id,),
+            )
+            for section, quantum, seconds in rows:
+                samples.setdefault((section, quantum), []).append(seconds)
+        return samples
+
+
+class HistoryReport(PrintableReport):
+    """The current run compared with an earlier one, over the quanta both of
+    them timed. Runs of one invocation share the state of the machine, so the
+    sections are the observations, each one changing by the median change of
+    its quanta. The run is slower when they changed by MIN_CHANGE or more
+    with a signed-rank p-value under ALPHA. Sections beyond SPREAD robust
+    deviations from the rest stand out but never fail it, since a single one
+    can drift as much as a regression would."""
+
+    ALPHA = 0.05
+    MIN_CHANGE = 0.02
+    SPREAD = 3.5
+    MIN_SECTIONS = 5
+
+    def __init__(
+        self, test_path: str, history: BenchHistory, ref_run, verbose: bool = False
+    ) -> None:
+        super().__init__(test_path)
+        self.__ref_run = ref_run
+        self.__verbose = verbose
+        self.__rows = []
+        self.change = 0.0
+        self.p_value = 1.0
+
+        # a run picked by its id may have been timed some other way
+        if ref_run[-1] != history.options:
+            self.add_note("options:", f"baseline ran with {ref_run[-1]}")
+            self.add_note("", f"this run with {history.options}")
+
+        before = history.timings(ref_run[0])
+        after = history.timings()
+        quanta: dict[str, list[tuple]] = dict()
+        for key in after:
+            if key in before:
+                quanta.setdefault(key[0], []).append(key)
+
+        changes = []
+        for section, keys in quanta.items():
+            old = [statistics.median(before[k]) for k in keys]
+            new = [statistics.median(after[k]) for k in keys]
+            change = statistics.median(math.log(n / o) for o, n in zip(old, new))
+            changes.append(change)
+            self.__rows.append(
+                [section, statistics.median(old), statistics.median(new), change, 0.0]
+            )
+
+        if changes:
+            self.change = statistics.median(changes)
+        if len(changes) < HistoryReport.MIN_SECTIONS:
+            self.add_note(
+                "warning:",
+                f"{HistoryReport.MIN_SECTIONS} sections are needed to tell it slower",
+            )
+            return
+
+        # median absolute deviation, scaled to match a standard deviation
+        deviation = 1.4826 * statistics.median(abs(c - self.change) for c in changes)
+        deviation = max(deviation, math.log(1 + HistoryReport.MIN_CHANGE))
+        for row in self.__rows:
+            row[-1] = (row[-2] - self.change) / deviation
+        self.p_value = signed_rank_p_value(changes)
+
+    @property
+    def slower(self) -> bool:
+        grew = self.change >= math.log(1 + HistoryReport.MIN_CHANGE)
+        return grew and self.p_value < HistoryReport.ALPHA
+
+    def stands_out(self, row) -> bool:
+        *_, change, spread = row
+        grew = change >= math.log(1 + HistoryReport.MIN_CHANGE)
+        return grew and spread > HistoryReport.SPREAD
+
+    def print_report(self):
+        md_table = [("section", "before", "after", "change", "spread")]
+        md_format = ("L", "R", "R", "R", "R")
+
+        for row in self.__rows:
+            if not self.__verbose and not self.stands_out(row):
+                continue
+            section, old_median, new_median, change, spread = row
+            md_table.append(
+                (
+                    section,
+                    f"{1000 * old_median:.3f} ms",
+                    f"{1000 * new_median:.3f} ms",
+                    f"{100 * math.expm1(change):+.1f}%",
+                    f"{spread:+.1f}",
+                )
+            )
+
+        if len(md_table) > 1:
+            print()
+            print("\n".join(TesterBase.make_md_table(md_table, md_format)))
+
+        run_id, started, host, source, build, _ = self.__ref_run
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(started))
+        change = f"{100 * math.expm1(self.change):+.1f}%, p-value {self.p_value:.4f}"
+        standing = sum(1 for row in self.__rows if self.stands_out(row))
+        COLSIZE = 10
+        out_report = []
+        out_report.append(
+            f"{'baseline:':<{COLSIZE}}run {run_id} of {source[:12]} on {host}, {when}"
+        )
+        out_report.append(f"{'compared:':<{COLSIZE}}{len(self.__rows)} sections")
+        out_report.append(f"{'change:':<{COLSIZE}}{change}")
+        out_report.append(f"{'status:':<{COLSIZE}}{'SLOWER' if self.slower else 'ok'}")
+        out_report.append(f"{'outliers:':<{COLSIZE}}{standing} sections")
+        out_report.extend(self.format_notes(COLSIZE))
+        out_report[-1] += "\n"
+        super().print_report(out_report)
@@ -0,0 +1,257 @@
+import heapq
+import struct
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class OracleEngines:
+    PYTHON = "python"
+    NUMPY = "numpy"
+    OPTIONS = {PYTHON, NUMPY}
+    DEFAULT = PYTHON
+
+
+def parse_payload(text: str) -> list[tuple[int, int, int]]:
+    """Reads a payload (process count, then `pid, arrival, burst` per line)
+    into a list of (pid, arrival, burst)."""
+    lines = [l for l in text.split("\n") if l.strip()]
+    if not lines:
+        raise ValueError("payload is empty")
+
+    count = int(lines[0])
+    processes = [tuple(int(v) for v in l.split(",")) for l in lines[1 : count + 1]]
+
+    if len(processes) != count or any(len(p) != 3 for p in processes):
+        raise ValueError(f"payload does not list {count} processes")
+
+    return processes
+
+
+def format_payload(processes: list[tuple[int, int, int]]) -> bytes:
+    """Inverse of parse_payload, in the layout of the test file."""
+    lines = [str(len(processes))]
+    lines.extend(f"{pid}, {arrival}, {burst}" for pid, arrival, burst in processes)
+    return "".join(l + "\n" for l in lines).encode()
+
+
+def to_float32(value: float) -> float:
+    # the reference output averages in single precision
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+def simulate(processes: list[tuple[int, int, int]], quantum: int):
+    """Round robin over (pid, arrival, burst) processes. Returns the average
+    waiting and response times.
+
+    Processes arriving while a slice runs are queued before the preempted
+    process, and ties in arrival keep the order of the payload.
+    """
+    if quantum <= 0:
+        raise ValueError(f"quantum must be positive, got {quantum}")
+
+    count = len(processes)
+    if count == 0:
+        return (0.0, 0.0)
+
+    arrivals = [(arrival, i) for i, (_, arrival, _) in enumerate(processes)]
+    heapq.heapify(arrivals)
+    remaining = [burst for _, _, burst in processes]
+    first_run = [None] * count
+    ready: deque[int] = deque()
+    time = 0
+    total_wait = 0
+    total_resp = 0
+    finished = 0
+
+    while finished < count:
+        while arrivals and arrivals[0][0] <= time:
+            ready.append(heapq.heappop(arrivals)[1])
+
+        if not ready:
+            time = arrivals[0][0]
+            continue
+
+        current = ready.popleft()
+        if first_run[current] is None:
+            first_run[current] = time
+            total_resp += time - processes[current][1]
+
+        run = min(quantum, remaining[current])
+        time += run
+        remaining[current] -= run
+
+        while arrivals and arrivals[0][0] <= time:
+            ready.append(heapq.heappop(arrivals)[1])
+
+        if remaining[current]:
+            ready.append(current)
+        else:
+            _, arrival, burst = processes[current]
+            total_wait += time - arrival - burst
+            finished += 1
+
+    return (to_float32(total_wait / count), to_float32(total_resp / count))
+
+
+def format_output(avg_wait: float, avg_resp: float) -> str:
+    return (
+        f"Average waiting time: {avg_wait:.2f}\nAverage response time: {avg_resp:.2f}\n"
+    )
+
+
+def reference_callback(filename: str, q_size: str, *args):
+    """Drop-in replacement of project_callback that never spawns a process."""
+    with open(filename) as file:
+        processes = parse_payload(file.read())
+    return format_output(*simulate(processes, int(q_size)))
+
+
+def simulate_many(processes: list[tuple[int, int, int]], quanta: list[int]):
+    """Same as simulate for every quantum at once, one row of NumPy arrays per
+    quantum. Returns arrays of average waiting and response times.
+
+    Rather than one time slice, each step runs a full pass over the ready
+    queue of every row. Since the queue is FIFO, everything queued when the
+    pass starts runs before anything queued during the pass, so slice times
+    are a cumulative sum along the row and the next queue is the requeued
+    processes merged with the arrivals by the slice they came in after. The
+    number of steps is then bounded by the longest burst over the smallest
+    quantum rather than by the total work.
+    """
+    if np is None:
+        raise ImportError("the numpy oracle needs numpy installed")
+
+    quanta = np.asarray(quanta, dtype=np.int64)
+    if (quanta <= 0).any():
+        raise ValueError(f"quantum must be positive, got {quanta.min()}")
+
+    rows = len(quanta)
+    count = len(processes)
+    if count == 0:
+        return (np.zeros(rows, dtype=np.float32), np.zeros(rows, dtype=np.float32))
+
+    # processes are renumbered by arrival, ties keep the order of the payload
+    table = np.asarray(processes, dtype=np.int64).reshape(count, 3)
+    order = np.lexsort((np.arange(count), table[:, 1]))
+    arrival = table[order, 1]
+    burst = table[order, 2]
+
+    queue = np.zeros((rows, count), dtype=np.int64)  # ready queue, head first
+    size = np.zeros(rows, dtype=np.int64)
+    next_arrival = np.zeros(rows, dtype=np.int64)
+    remaining = np.tile(burst, (rows, 1))
+    started = np.zeros((rows, count), dtype=bool)
+    time = np.zeros(rows, dtype=np.int64)
+    finished = np.zeros(rows, dtype=np.int64)
+    total_wait = np.zeros(rows, dtype=np.int64)
+    total_resp = np.zeros(rows, dtype=np.int64)
+
+    def spread(counts):
+        # row of each of the counts[i] items of every row i, and their rank
+        owner = np.repeat(np.arange(len(counts)), counts)
+        rank = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return (owner, rank)
+
+    while True:
+        sel = np.flatnonzero(finished < count)
+        if not len(sel):
+            break
+
+        # rows with nothing ready jump to their next arrival
+        idle = sel[size[sel] == 0]
+        if len(idle):
+            time[idle] = np.maximum(time[idle], arrival[next_arrival[idle]])
+            due = np.searchsorted(arrival, time[idle], "right") - next_arrival[idle]
+            owner, rank = spread(due)
+            queue[idle[owner], rank] = next_arrival[idle[owner]] + rank
+            size[idle] = due
+            next_arrival[idle] += due
+
+        width = size[sel].max()
+        valid = np.arange(width) < size[sel, None]
+        at = np.broadcast_to(sel[:, None], valid.shape)
+        pid = np.where(valid, queue[sel, :width], 0)
+
+        rem = remaining[at, pid]
+        ran = np.where(valid, np.minimum(quanta[sel, None], rem), 0)
+        ends = time[sel, None] + np.cumsum(ran, axis=1)
+        starts = ends - ran
+
+        fresh = valid & ~started[at, pid]
+        started[at[fresh], pid[fresh]] = True
+        total_resp[sel] += np.where(fresh, starts - arrival[pid], 0).sum(axis=1)
+
+        remaining[at[valid], pid[valid]] -= ran[valid]
+        left = valid & (rem > ran)
+        gone = valid & ~left
+        total_wait[sel] += np.where(gone, ends - arrival[pid] - burst[pid], 0).sum(1)
+        finished[sel] += gone.sum(axis=1)
+        time[sel] = ends[:, -1]
+
+        # arrivals join after the first slice that ends at or past them
+        due = np.searchsorted(arrival, time[sel], "right") - next_arrival[sel]
+        owner, rank = spread(due)
+        new_pid = next_arrival[sel[owner]] + rank
+        stride = ends.max() + 1
+        flat_ends = (ends + np.arange(len(sel))[:, None] * stride).ravel()
+        after = np.searchsorted(flat_ends, arrival[new_pid] + owner * stride, "left")
+        after -= owner * width
+        next_arrival[sel] += due
+
+        back_row, back_slice = np.nonzero(left)
+        merged_row = np.concatenate((back_row, owner))
+        merged_key = np.concatenate((2 * back_slice + 1, 2 * after))
+        merged_pid = np.concatenate((pid[left], new_pid))
+        merged_rank = np.concatenate((np.zeros(len(back_row), np.int64), rank))
+
+        order = np.lexsort((merged_rank, merged_key, merged_row))
+        merged_row = merged_row[order]
+        size[sel] = np.bincount(merged_row, minlength=len(sel))
+        _, slot = spread(size[sel])
+        queue[sel[merged_row], slot] = merged_pid[order]
+
+    return (
+        (total_wait / count).astype(np.float32),
+        (total_resp / count).astype(np.float32),
+    )
+
+
+class BatchOracle:
+    """Callback that answers every quantum of a payload with one call to
+    simulate_many. TesterBase hands it whole sections through `batch`."""
+
+    def __init__(self) -> None:
+        if np is None:
+            raise ImportError("the numpy oracle needs numpy installed")
+
+    def __call__(self, filename: str, q_size: str, *args):
+        output = self.batch(filename, [q_size], *args)[0]
+        if isinstance(output, Exception):
+            raise output
+        return output
+
+    def batch(self, filename: str, quanta: list[str], *args) -> list:
+        """Returns the output for each quantum, or the exception it raised."""
+        with open(filename) as file:
+            processes = parse_payload(file.read())
+
+        outputs: list = [None] * len(quanta)
+        valid: list[int] = []
+        for i, q in enumerate(quanta):
+            try:
+                if int(q) <= 0:
+                    raise ValueError(f"quantum must be positive, got {q}")
+                valid.append(i)
+            except ValueError as err:
+                outputs[i] = err
+
+        if valid:
+            waits, resps = simulate_many(processes, [int(quanta[i]) for i in valid])
+            for i, wait, resp in zip(valid, waits.tolist(), resps.tolist()):
+                outputs[i] = format_output(wait, resp)
+
+        return outputs
@@ -0,0 +1,102 @@
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class PayloadFile:
+    """A payload written to memory and the path the program can open it by."""
+
+    def __init__(self, payload: bytes, shm_dir: str) -> None:
+        self.__fd = None
+        self.__file = None
+
+        if shm_dir is None:
+            self.__fd = os.memfd_create("rr-payload")
+            self.path = f"/proc/{os.getpid()}/fd/{self.__fd}"
+            self.__write(self.__fd, payload)
+        else:
+            self.__file = tempfile.NamedTemporaryFile(prefix="rr-", dir=shm_dir)
+            self.path = self.__file.name
+            self.__write(self.__file.fileno(), payload)
+
+    def __write(self, fd: int, payload: bytes):
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view) :]
+
+    def close(self):
+        if self.__fd is not None:
+            os.close(self.__fd)
+        if self.__file is not None:
+            self.__file.close()
+
+
+class PayloadStore:
+    """Hands out paths to payload files without going through the disk.
+
+    Payloads live in anonymous memory files (memfd) opened by the program
+    through /proc, or in /dev/shm where memfd is not available, and only fall
+    back to the regular temporary directory when neither exists. Files are
+    shared by content, so every quantum and every section with the same
+    payload reuses one file. Files nobody uses are kept around for a while
+    in case another section brings the same payload.
+    """
+
+    def __init__(self, max_idle: int = 64) -> None:
+        self.__lock = threading.Lock()
+        self.__active: dict[bytes, list] = dict()  # digest: [file, users]
+        self.__idle: OrderedDict[bytes, PayloadFile] = OrderedDict()
+        self.__max_idle = max_idle
+        self.__shm_dir = PayloadStore.pick_shm_dir()
+
+    @staticmethod
+    def pick_shm_dir():
+        """None means memfd, otherwise the directory for payload files."""
+        if hasattr(os, "memfd_create") and os.path.isdir(f"/proc/{os.getpid()}/fd"):
+            return None
+        if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+            return "/dev/shm"
+        return tempfile.gettempdir()
+
+    @contextmanager
+    def open(self, payload: bytes):
+        digest = hashlib.sha256(payload).digest()
+        entry = self.__acquire(digest, payload)
+        try:
+            yield entry.path
+        finally:
+            self.__release(digest)
+
+    def __acquire(self, digest: bytes, payload: bytes) -> PayloadFile:
+        with self.__lock:
+            if digest in self.__active:
+                entry = self.__active[digest]
+                entry[1] += 1
+                return entry[0]
+
+            file = self.__idle.pop(digest, None)
+            if file is None:
+                file = PayloadFile(payload, self.__shm_dir)
+            self.__active[digest] = [file, 1]
+            return file
+
+    def __release(self, digest: bytes):
+        with self.__lock:
+            entry = self.__active[digest]
+            entry[1] -= 1
+            if entry[1]:
+                return
+
+            del self.__active[digest]
+            self.__idle[digest] = entry[0]
+            while len(self.__idle) > self.__max_idle:
+                self.__idle.popitem(last=False)[1].close()
+
+    def close(self):
+        """Closes the files that are not in use."""
+        with self.__lock:
+            while self.__idle:
+                self.__idle.popitem()[1].close()
@@ -0,0 +1,156 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parts_digest(seed: str, *parts: bytes) -> str:
+    # parts are length prefixed so that moving bytes between them changes it
+    digest = hashlib.sha256(seed.encode())
+    for part in parts:
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of program outputs.
+
+    Entries are keyed by the hash of the program binary, the payload bytes,
+    the quantum and the extra arguments, so a rebuilt binary never sees the
+    outputs of the previous one. Each entry is a file named after its key and
+    its modification time is bumped on every hit, which `evict` uses to drop
+    the least recently used entries first.
+    """
+
+    def __init__(
+        self, cache_dir: str, binary_path: str, max_size: int, max_age: float
+    ) -> None:
+        self.__dir = os.path.join(cache_dir, "results")
+        self.__binary = file_digest(binary_path)
+        self.__max_size = max_size
+        self.__max_age = max_age
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__lookups = 0
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def lookups(self) -> int:
+        return self.__lookups
+
+    def key(self, payload: bytes, quantum_size: str, *args: str) -> str:
+        return parts_digest(
+            self.__binary, payload, quantum_size.encode(), *(a.encode() for a in args)
+        )
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.__dir, key[:2], key)
+
+    def get(self, key: str):
+        path = self.__path(key)
+        try:
+            with open(path) as file:
+                output = file.read()
+            os.utime(path)
+        except OSError:
+            output = None
+
+        with self.__lock:
+            self.__lookups += 1
+            self.__hits += output is not None
+
+        return output
+
+    def put(self, key: str, output: str):
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # write aside and rename so concurrent testers never read half entries
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "w") as file:
+            file.write(output)
+        os.replace(temp_path, path)
+
+    def evict(self):
+        entries = []
+        for root, _, files in os.walk(self.__dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        deadline = time.time() - self.__max_age
+        total = sum(size for _, size, _ in entries)
+
+        for mtime, size, path in entries:
+            if mtime >= deadline and total <= self.__max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+class PassedSections:
+    """On-disk record of the sections that passed, so they can be skipped
+    until either them or the program change.
+
+    Sections are keyed by the hash of the program binary, everything in the
+    section that decides whether it passes and the extra arguments. Each one
+    that passed leaves an empty file named after its key, whose modification
+    time is bumped every time it is skipped. `evict` drops the ones not seen
+    in a while, such as the ones of older binaries.
+    """
+
+    def __init__(self, cache_dir: str, binary_path: str, max_age: float) -> None:
+        self.__dir = os.path.join(cache_dir, "passed")
+        self.__binary = file_digest(binary_path)
+        self.__max_age = max_age
+
+    def key(self, *parts: bytes) -> str:
+        return parts_digest(self.__binary, *parts)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.__dir, key[:2], key)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            os.utime(self.__path(key))
+        except OSError:
+            return False
+        return True
+
+    def add(self, key: str):
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb"):
+            pass
+
+    def evict(self):
+        deadline = time.time() - self.__max_age
+        for root, _, files in os.walk(self.__dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime < deadline:
+                        os.remove(path)
+                except OSError:
+                    pass
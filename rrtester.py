@@ -1,45 +1,254 @@
 import os
+import shutil
+import sqlite3
+import platform
+import asyncio
+import tempfile
+import functools
+import contextlib
 import subprocess
+import oracle
+import childusage
 from arghelper import ArgsWrapper, TestingOptions, getArguments
-from unittester import UnitTester, ResultGenerator, BatchRun
+from builder import BuildCache, BuildVariants
+from concurrent.futures import ThreadPoolExecutor
+from executors import ExecutorOptions
+from forkserver import ForkServerPool
+from fuzzer import FuzzTester
+from history import BenchHistory, HistoryReport
+from resultcache import PassedSections, ResultCache, file_digest
+from stabilizer import Stabilizer
+from unittester import UnitTester, ResultGenerator, BatchRun, BenchRun, MatrixReport
 
 
-def main(args: ArgsWrapper):
+def main(args: ArgsWrapper, prog: str = "./rr", forkserver: str = "./rr-forkserver"):
     tester = None
+    stabilizer = make_stabilizer(args)
+    callback = make_callback(args, prog, forkserver)
+    options = {
+        "suite_cache_dir": args.cache_options["cache_dir"],
+        "shrink": args.shrink,
+    }
+
+    binary_path = oracle.__file__ if args.oracle else prog
+    if args.cache and args.test_type != TestingOptions.TIME_PROG:
+        options["cache"] = ResultCache(binary_path=binary_path, **args.cache_options)
+
+    passed = None
+    history = None
+    if args.test_type == TestingOptions.UNIT_TEST and not args.force:
+        passed = PassedSections(
+            args.cache_options["cache_dir"],
+            binary_path,
+            args.cache_options["max_age"],
+        )
 
     if args.test_type == TestingOptions.UNIT_TEST:
-        tester = UnitTester("./unit_tests.md", project_callback, *args.arguments)
+        tester = UnitTester(
+            "./unit_tests.md", callback, *args.arguments, passed=passed, **options
+        )
     elif args.test_type == TestingOptions.GEN_CASES:
-        tester = ResultGenerator("./unit_tests.md", project_callback, *args.arguments)
+        tester = ResultGenerator(
+            "./unit_tests.md", callback, *args.arguments, **options
+        )
     elif args.test_type == TestingOptions.TIME_PROG:
-        tester = BatchRun("./unit_tests.md", project_callback, *args.arguments)
+        if not args.oracle:
+            built = forkserver if args.fork_server else prog
+            history = open_history(args, built, stabilizer)
+        tester = BatchRun(
+            "./unit_tests.md",
+            callback,
+            *args.arguments,
+            **args.repetitions,
+            history=history,
+            **options,
+        )
+    elif args.test_type == TestingOptions.FUZZ_PROG:
+        tester = FuzzTester(callback, *args.arguments, **args.fuzzing, **options)
     else:
         raise SystemExit(f"Unexpected test type: {args.test_type}")
 
     if tester is None:
         raise SystemError("tester did not generate correctly")
 
-    tester.run_tests(**args.filters, verbose=args.verbose)
+    if stabilizer is not None:
+        for note in stabilizer.notes():
+            tester.result.add_note(*note)
+
+    try:
+        if args.calibrate:
+            calibrate(args, tester)
+        tester.run_tests(**args.filters, verbose=args.verbose, **args.execution)
+    finally:
+        if isinstance(callback, ForkServerPool):
+            callback.close()
+        if "cache" in options:
+            options["cache"].evict()
+        if passed is not None:
+            passed.evict()
+
+    if history is not None:
+        error = history.save()
+        if error is not None:
+            tester.result.add_note("warning:", f"run not kept in the history, {error}")
+
     tester.result.print_report()
 
+    if history is not None and args.compare_to is not None:
+        compare_history(args, history)
+
+
+def open_history(args: ArgsWrapper, binary_path: str, stabilizer) -> BenchHistory:
+    history = BenchHistory(args.cache_options["cache_dir"])
+    options = {
+        **args.execution,
+        "fork_server": args.fork_server,
+        "stabilize": args.stabilize,
+        "aslr": args.aslr if stabilizer is None else stabilizer.aslr,
+        "calibrate": args.calibrate,
+        **args.repetitions,
+        "args": ",".join(args.arguments),
+    }
+    history.start_run(
+        platform.node(),
+        file_digest("./rr.c"),
+        file_digest(binary_path),
+        " ".join(f"{k}={v}" for k, v in options.items()),
+    )
+    return history
+
+
+def compare_history(args: ArgsWrapper, history: BenchHistory):
+    try:
+        ref_run = history.find_run(args.compare_to)
+        if ref_run is None:
+            raise SystemExit(
+                f"--compare-to: no earlier run matches {args.compare_to}"
+                + ("" if args.compare_to.isdigit() else " with the same options")
+            )
+        report = HistoryReport("./unit_tests.md", history, ref_run, args.verbose)
+    except sqlite3.Error as err:
+        raise SystemExit(f"--compare-to: cannot read the history, {err}")
+
+    report.print_report()
+    if report.slower:
+        raise SystemExit(1)
+
+
+def calibrate(args: ArgsWrapper, tester: BatchRun):
+    # a fork server only runs the program it was linked with
+    noop = None
+    noop_prog = shutil.which("true")
+    if noop_prog is not None and not args.fork_server:
+        callback = make_callback(args, noop_prog, noop_prog)
+        noop = BatchRun(
+            "./unit_tests.md", callback, *args.arguments, **args.repetitions
+        )
+
+    tester.calibrate(noop, args.executor)
+
+
+def make_stabilizer(args: ArgsWrapper):
+    # applied before any worker thread starts, so that all of them inherit it
+    if not args.stabilize:
+        return None
+    if not hasattr(os, "sched_setaffinity"):
+        raise SystemExit("--stabilize needs a system with sched_setaffinity (Linux)")
+    stabilizer = Stabilizer(aslr=args.aslr)
+    stabilizer.apply()
+    return stabilizer
+
+
+def make_callback(args: ArgsWrapper, prog: str, forkserver: str):
+    if args.oracle == oracle.OracleEngines.NUMPY:
+        if oracle.np is None:
+            raise SystemExit("--oracle numpy needs numpy, install it or use python")
+        return oracle.BatchOracle()
+    elif args.oracle:
+        return oracle.reference_callback
+    elif args.fork_server:
+        return ForkServerPool(forkserver, args.execution["jobs"])
+    elif args.executor == ExecutorOptions.ASYNCIO:
+        return functools.partial(async_project_callback, prog=prog)
+    else:
+        return functools.partial(project_callback, prog=prog)
+
+
+def bench(args: ArgsWrapper, builds: BuildCache):
+    target = "rr-forkserver" if args.fork_server else "rr"
+    report = MatrixReport("./unit_tests.md")
+
+    # variants build in scratch directories of their own, so all at once
+    with ThreadPoolExecutor(max_workers=len(args.variants)) as pool:
+        jobs = [
+            (v, pool.submit(builds.build, target, BuildVariants.VARIABLES[v]))
+            for v in args.variants
+        ]
+
+    # only once the builds are done, which would all share the pinned CPU
+    stabilizer = make_stabilizer(args)
+
+    for variant, job in jobs:
+        try:
+            prog = job.result()
+        except subprocess.CalledProcessError:
+            report.add_failed_build(variant)
+            continue
+
+        print(f"# Build {variant}")
+        callback = make_callback(args, prog, prog)
+        tester = BenchRun(
+            "./unit_tests.md",
+            callback,
+            *args.arguments,
+            suite_cache_dir=args.cache_options["cache_dir"],
+        )
+
+        try:
+            tester.run_tests(**args.filters, verbose=args.verbose, **args.execution)
+        finally:
+            if isinstance(callback, ForkServerPool):
+                callback.close()
+
+        report.add_build(variant, tester.result, tester.timings)
+
+    if stabilizer is not None:
+        for note in stabilizer.notes():
+            report.add_note(*note)
+
+    report.print_report()
+
 
-def project_callback(filename: str, q_size: str, *args):
-    PROG_NAME = os.path.abspath("./rr")
+def project_callback(filename: str, q_size: str, *args, prog: str = "./rr"):
+    PROG_NAME = os.path.abspath(prog)
     retval = None
 
     try:
         if args:
-            retval = subprocess.check_output(
+            retval = childusage.check_output(
                 (PROG_NAME, filename, q_size, *args)
             ).decode()
         else:
-            retval = subprocess.check_output((PROG_NAME, filename, q_size)).decode()
+            retval = childusage.check_output((PROG_NAME, filename, q_size)).decode()
     except Exception as err:
         raise err
 
     return retval
 
 
+async def async_project_callback(filename: str, q_size: str, *args, prog: str = "./rr"):
+    PROG_NAME = os.path.abspath(prog)
+    cmd = (PROG_NAME, filename, q_size, *args)
+
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=subprocess.PIPE)
+    stdout, _ = await proc.communicate()
+
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stdout)
+
+    return stdout.decode()
+
+
 def validate_required_files():
     INVALID_DIR = any(
         not os.path.exists(os.path.abspath(p))
@@ -50,12 +259,22 @@ def validate_required_files():
 
 
 if __name__ == "__main__":
-    validate_required_files()
     args = getArguments()
-    subprocess.check_output("make")
-    try:
-        main(args)
-    except Exception as err:
-        raise err
-    finally:
-        subprocess.check_output(("make", "clean"))
+    if args.oracle:
+        main(args)  # nothing to build
+    else:
+        validate_required_files()
+        with contextlib.ExitStack() as stack:
+            build_dir = args.cache_options["cache_dir"]
+            if not args.build_cache:
+                build_dir = stack.enter_context(
+                    tempfile.TemporaryDirectory(prefix="rrtester-")
+                )
+
+            builds = BuildCache(build_dir)
+            if args.test_type == TestingOptions.BENCH_PROG:
+                bench(args, builds)
+            elif args.fork_server:
+                main(args, builds.build("rr"), builds.build("rr-forkserver"))
+            else:
+                main(args, builds.build("rr"))
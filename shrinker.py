@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Shrinker:
+    """Delta debugging over the processes of a payload.
+
+    Starting from processes (pid, arrival, burst) for which fails() is true,
+    it first removes as many processes as it can, then lowers arrivals and
+    bursts one at a time, keeping every change after which fails() is still
+    true. Candidates are tried jobs at a time and the first failing one in
+    order wins, so the result does not depend on which run finishes first.
+    Every candidate is only tried once.
+    """
+
+    def __init__(self, fails, jobs: int = 1) -> None:
+        self.__fails = fails
+        self.__jobs = jobs
+        self.__tried: dict[tuple, bool] = dict()
+
+    @property
+    def tried(self) -> int:
+        return len(self.__tried)
+
+    def shrink(self, processes: list[tuple[int, int, int]]) -> list[tuple]:
+        processes = tuple(processes)
+        with ThreadPoolExecutor(max_workers=self.__jobs) as self.__pool:
+            processes = self.__remove_processes(processes)
+            processes = self.__lower_values(processes)
+
+            renumbered = tuple((i, a, b) for i, (_, a, b) in enumerate(processes, 1))
+            processes = self.__first_failing([renumbered]) or processes
+
+        return list(processes)
+
+    def __first_failing(self, candidates: list[tuple]):
+        candidates = list(dict.fromkeys(candidates))
+        for start in range(0, len(candidates), self.__jobs):
+            batch = candidates[start : start + self.__jobs]
+            fresh = [c for c in batch if c not in self.__tried]
+            for candidate, failed in zip(fresh, self.__pool.map(self.__fails, fresh)):
+                self.__tried[candidate] = failed
+
+            for candidate in batch:
+                if self.__tried[candidate]:
+                    return candidate
+
+        return None
+
+    def __remove_processes(self, processes: tuple) -> tuple:
+        chunks = 2
+        while len(processes) > 1:
+            size = -(-len(processes) // chunks)
+            parts = [
+                (processes[i : i + size], processes[:i] + processes[i + size :])
+                for i in range(0, len(processes), size)
+            ]
+            subsets = [subset for subset, _ in parts]
+            complements = [rest for _, rest in parts if rest]
+
+            found = self.__first_failing(subsets + complements)
+            if found is not None:
+                chunks = 2 if found in subsets else max(chunks - 1, 2)
+                processes = found
+            elif chunks < len(processes):
+                chunks = min(2 * chunks, len(processes))
+            else:
+                break
+
+        return processes
+
+    def __lower_values(self, processes: tuple) -> tuple:
+        while True:
+            candidates = []
+
+            earliest = min(a for _, a, _ in processes)
+            if earliest:
+                candidates.append(tuple((p, a - earliest, b) for p, a, b in processes))
+
+            for i, (pid, arrival, burst) in enumerate(processes):
+                for lower in self.__lower(arrival, 0):
+                    candidates.append(
+                        processes[:i] + ((pid, lower, burst),) + processes[i + 1 :]
+                    )
+                for lower in self.__lower(burst, 1):
+                    candidates.append(
+                        processes[:i] + ((pid, arrival, lower),) + processes[i + 1 :]
+                    )
+
+            found = self.__first_failing(candidates)
+            if found is None:
+                return processes
+            processes = found
+
+    def __lower(self, value: int, floor: int):
+        # floor first, then closer and closer to value
+        step = value - floor
+        while step > 0:
+            yield value - step
+            step //= 2
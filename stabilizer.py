@@ -0,0 +1,91 @@
+import os
+import ctypes
+import resource
+
+
+class Stabilizer:
+    """Settings that make the timings of the program steadier.
+
+    The tester is pinned to one CPU, the last one it may use since the first
+    ones tend to take more interrupts, and gets the highest priority allowed,
+    up to NICENESS. With aslr off, address space randomization is disabled
+    for what it executes, as `setarch -R` does, so every run gets the same
+    memory layout. `apply` sets all of it once on the tester and every run
+    inherits it, which keeps spawning runs as cheap as without it. Linux
+    keeps affinity and priority per thread and threads inherit them from the
+    one starting them, so it must be called before any worker is started.
+    """
+
+    NICENESS = -10
+    ADDR_NO_RANDOMIZE = 0x0040000  # from <sys/personality.h>
+    QUERY_PERSONALITY = 0xFFFFFFFF
+
+    def __init__(self, aslr: bool = True) -> None:
+        self.cpu = max(os.sched_getaffinity(0))
+        self.niceness = self.__allowed_niceness()
+        self.aslr = aslr
+        self.__personality = None
+        self.__aslr_error = None
+
+        if not aslr:
+            libc = ctypes.CDLL(None, use_errno=True)
+            self.__personality = libc.personality
+            self.__personality.argtypes = (ctypes.c_ulong,)
+            self.__personality.restype = ctypes.c_int
+
+    def __allowed_niceness(self):
+        # RLIMIT_NICE allows a niceness of 20 - limit without privileges
+        current = os.getpriority(os.PRIO_PROCESS, 0)
+        limit = resource.getrlimit(resource.RLIMIT_NICE)[0]
+        lowest = 20 - limit
+        if os.geteuid() == 0 or limit == resource.RLIM_INFINITY:
+            lowest = Stabilizer.NICENESS
+        niceness = max(Stabilizer.NICENESS, lowest)
+        return niceness if niceness < current else None
+
+    def apply(self):
+        os.sched_setaffinity(0, {self.cpu})
+        if self.niceness is not None:
+            os.setpriority(os.PRIO_PROCESS, 0, self.niceness)
+        if self.__personality is not None:
+            persona = self.__personality(Stabilizer.QUERY_PERSONALITY)
+            if persona != -1:
+                persona = self.__personality(persona | Stabilizer.ADDR_NO_RANDOMIZE)
+            if persona == -1:
+                self.__aslr_error = os.strerror(ctypes.get_errno())
+
+            # containers may deny it, so report the setting that took effect
+            persona = self.__personality(Stabilizer.QUERY_PERSONALITY)
+            self.aslr = persona == -1 or not persona & Stabilizer.ADDR_NO_RANDOMIZE
+            if self.aslr and self.__aslr_error is None:
+                self.__aslr_error = "personality(2) was ignored"
+
+    def governor(self):
+        """Frequency governor of the pinned CPU, or None if it is unknown."""
+        path = f"/sys/devices/system/cpu/cpu{self.cpu}/cpufreq/scaling_governor"
+        try:
+            with open(path) as file:
+                return file.read().strip()
+        except OSError:
+            return None
+
+    def notes(self) -> list[tuple[str, str]]:
+        """(label, value) pairs describing the settings for a report."""
+        priority = "unchanged"
+        if self.niceness is not None:
+            priority = f"niceness {self.niceness}"
+
+        settings = f"cpu {self.cpu}, {priority}, aslr {'on' if self.aslr else 'off'}"
+        notes = [("stabilized:", settings)]
+        if self.__aslr_error is not None:
+            notes.append(("warning:", f"aslr left on, {self.__aslr_error}"))
+
+        governor = self.governor()
+        if governor is not None and governor != "performance":
+            notes.append(
+                (
+                    "warning:",
+                    f"cpu {self.cpu} runs the {governor} governor, not performance",
+                )
+            )
+        return notes
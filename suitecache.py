@@ -0,0 +1,133 @@
+import os
+import pickle
+import hashlib
+import tempfile
+from resultcache import file_digest
+
+
+class SuiteCacheWriter:
+    """Streams records into a new cache file that only replaces the current
+    one if the writer is left without an error."""
+
+    def __init__(self, path: str, header: tuple) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, self.__temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        self.__file = os.fdopen(fd, "wb")
+        self.__path = path
+        self.add(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        self.__file.close()
+        if exc_type is None:
+            os.replace(self.__temp_path, self.__path)
+        else:
+            os.remove(self.__temp_path)
+
+    def add(self, record):
+        pickle.dump(record, self.__file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class SuiteCache:
+    """Pickled copy of a parsed test suite, stored as one record per title or
+    section so it can be streamed back without holding the whole suite.
+
+    The cache is trusted as long as the size and modification time of the
+    suite have not changed. If they did, the suite is hashed and the cache is
+    still reused when the contents turn out to be the same.
+    """
+
+    VERSION = 3
+
+    def __init__(self, cache_dir: str, test_path: str) -> None:
+        test_path = os.path.abspath(test_path)
+        name = hashlib.sha256(test_path.encode()).hexdigest()[:16]
+        self.__path = os.path.join(cache_dir, "suites", f"{name}.pickle")
+        self.__index_path = os.path.join(cache_dir, "suites", f"{name}.index")
+        self.__test_path = test_path
+
+    def __stamp(self) -> tuple[int, int]:
+        stat = os.stat(self.__test_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        """Returns an iterator over the cached records or None if the cache
+        does not match the suite."""
+        try:
+            file = open(self.__path, "rb")
+        except OSError:
+            return None
+
+        try:
+            version, stamp, digest = pickle.load(file)
+        except Exception:
+            file.close()
+            return None  # corrupt or written by an older tester
+
+        if version != SuiteCache.VERSION:
+            file.close()
+            return None
+
+        snapshot = None
+        if stamp != self.__stamp():
+            snapshot = self.snapshot()
+            if digest != snapshot[1]:
+                file.close()
+                return None
+
+        return self.__records(file, snapshot)
+
+    def __records(self, file, snapshot):
+        with file:
+            if snapshot is None:
+                yield from self.__unpickle(file)
+                return
+
+            # same contents under a new stamp, rewrite so later loads are quick
+            with self.writer(snapshot) as writer:
+                for record in self.__unpickle(file):
+                    writer.add(record)
+                    yield record
+
+    def __unpickle(self, file):
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+    def snapshot(self) -> tuple:
+        """Identifies the current contents of the suite. Take it before parsing
+        so an edit made while parsing is never cached under the new stamp."""
+        return (self.__stamp(), file_digest(self.__test_path))
+
+    def writer(self, snapshot: tuple) -> SuiteCacheWriter:
+        return SuiteCacheWriter(self.__path, (SuiteCache.VERSION, *snapshot))
+
+    def load_index(self):
+        """Returns the byte offsets of every section of the suite or None if
+        the index does not match the suite."""
+        try:
+            with open(self.__index_path, "rb") as file:
+                version, stamp, digest, index = pickle.load(file)
+        except Exception:
+            return None  # missing, corrupt or written by an older tester
+
+        if version != SuiteCache.VERSION:
+            return None
+
+        if stamp != self.__stamp():
+            snapshot = self.snapshot()
+            if digest != snapshot[1]:
+                return None
+            self.save_index(index, snapshot)
+
+        return index
+
+    def save_index(self, index: list, snapshot: tuple):
+        with SuiteCacheWriter(
+            self.__index_path, (SuiteCache.VERSION, *snapshot, index)
+        ):
+            pass
@@ -0,0 +1,18 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from arghelper import getArguments
+
+
+class HelpTest(unittest.TestCase):
+    def test_help_prints(self):
+        # argparse %-formats help strings, so a stray % only shows up here
+        out = io.StringIO()
+        with redirect_stdout(out), self.assertRaises(SystemExit) as exit:
+            getArguments("-h")
+        self.assertEqual(exit.exception.code, 0)
+        self.assertIn("--repeat", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import io
+import random
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from history import BenchHistory, HistoryReport
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.rng = random.Random(0)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def run_suite(self, slowdown=lambda section: 1.0, options="repeat=3"):
+        history = BenchHistory(self.dir.name)
+        history.start_run("host", "c0ffee", "build", options)
+        for section in range(8):
+            for quantum in range(1, 11):
+                base = 0.001 * quantum * slowdown(section)
+                samples = [base * self.rng.uniform(0.99, 1.01) for _ in range(3)]
+                history.add_timings(f"## {section}", str(quantum), samples)
+        return history
+
+    def compare(self, history, ref="last"):
+        report = HistoryReport("unit_tests.md", history, history.find_run(ref))
+        with redirect_stdout(io.StringIO()):
+            report.print_report()
+        return report
+
+    def test_keeps_saved_runs(self):
+        self.assertIsNone(self.run_suite().save())
+        history = self.run_suite()
+        self.assertEqual(history.find_run("last")[0], 1)
+        self.assertEqual(history.find_run("c0f")[0], 1)
+        self.assertIsNone(history.find_run("beef"))
+        self.assertEqual(len(history.timings(1)), 80)
+
+    def test_unsaved_runs_leave_nothing(self):
+        self.run_suite()
+        self.assertIsNone(self.run_suite().find_run("last"))
+
+    def test_last_needs_same_options(self):
+        self.run_suite().save()
+        history = self.run_suite(options="repeat=5")
+        self.assertIsNone(history.find_run("last"))
+        self.assertIsNotNone(history.find_run("1"))
+
+    def test_locked_database(self):
+        self.run_suite().save()
+        db = sqlite3.connect(f"{self.dir.name}/{BenchHistory.FILENAME}")
+        db.execute("BEGIN EXCLUSIVE")
+        history = self.run_suite()
+        BenchHistory.TIMEOUT, timeout = 0.1, BenchHistory.TIMEOUT
+        try:
+            self.assertIsInstance(history.save(), sqlite3.OperationalError)
+        finally:
+            BenchHistory.TIMEOUT = timeout
+            db.rollback()
+            db.close()
+        self.assertIsNone(history.save())
+
+    def test_unchanged(self):
+        self.run_suite().save()
+        self.assertFalse(self.compare(self.run_suite()).slower)
+
+    def test_slower(self):
+        self.run_suite().save()
+        self.assertTrue(self.compare(self.run_suite(lambda s: 1.1)).slower)
+
+    def test_one_section_drifting(self):
+        self.run_suite().save()
+        report = self.compare(self.run_suite(lambda s: 1.5 if s == 3 else 1.0))
+        self.assertFalse(report.slower)
+
+    def test_too_few_sections(self):
+        history = BenchHistory(self.dir.name)
+        history.start_run("host", "c0ffee", "build", "repeat=1")
+        history.add_timings("## 0", "1", [0.001])
+        history.save()
+        history = BenchHistory(self.dir.name)
+        history.start_run("host", "c0ffee", "build", "repeat=1")
+        history.add_timings("## 0", "1", [0.002])
+        self.assertFalse(self.compare(history).slower)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+import oracle
+from unittester import ResultGenerator
+
+TEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "unit_tests.md")
+
+
+def random_processes(rng: random.Random) -> list[tuple[int, int, int]]:
+    # few distinct arrivals and bursts, so ties and zero bursts are common
+    return [
+        (pid, rng.choice([0, 0, 1, 2, 5, rng.randint(0, 40)]), rng.randint(0, 12))
+        for pid in range(1, rng.randint(0, 12) + 1)
+    ]
+
+
+class SimulateTest(unittest.TestCase):
+    def test_regenerates_unit_tests(self):
+        out = io.StringIO()
+        tester = ResultGenerator(TEST_PATH, oracle.reference_callback)
+        with redirect_stdout(out):
+            tester.run_tests(set(), False)
+
+        with open(TEST_PATH) as file:
+            self.assertEqual(out.getvalue(), file.read())
+
+    def test_parses_payload(self):
+        payload = "2\n1, 0, 3\n2, 1, 0\n"
+        self.assertEqual(oracle.parse_payload(payload), [(1, 0, 3), (2, 1, 0)])
+        with self.assertRaises(ValueError):
+            oracle.parse_payload("3\n1, 0, 3\n")
+
+    def test_payload_round_trip(self):
+        processes = random_processes(random.Random(0)) or [(1, 0, 1)]
+        payload = oracle.format_payload(processes).decode()
+        self.assertEqual(oracle.parse_payload(payload), processes)
+
+    def test_rejects_bad_quantum(self):
+        with self.assertRaises(ValueError):
+            oracle.simulate([(1, 0, 1)], 0)
+
+
+@unittest.skipIf(oracle.np is None, "numpy is not installed")
+class SimulateManyTest(unittest.TestCase):
+    def test_matches_simulate(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            processes = random_processes(rng)
+            quanta = sorted(rng.sample(range(1, 30), 6))
+            waits, resps = oracle.simulate_many(processes, quanta)
+            for q, wait, resp in zip(quanta, waits.tolist(), resps.tolist()):
+                expected = oracle.simulate(processes, q)
+                self.assertEqual((wait, resp), expected, (processes, q))
+
+    def test_batch_reports_bad_quanta(self):
+        callback = oracle.BatchOracle()
+        processes = [(1, 0, 3), (2, 0, 3)]
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(b"2\n1, 0, 3\n2, 0, 3\n")
+            file.flush()
+            outputs = callback.batch(file.name, ["2", "0", "x"])
+
+        expected = oracle.format_output(*oracle.simulate(processes, 2))
+        self.assertEqual(outputs[0], expected)
+        self.assertIsInstance(outputs[1], ValueError)
+        self.assertIsInstance(outputs[2], ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import random
+import unittest
+from shrinker import Shrinker
+
+
+def fails(processes) -> bool:
+    # stands in for a program that breaks once a long burst has company
+    return len(processes) >= 2 and max(b for _, _, b in processes) >= 7
+
+
+class ShrinkerTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.processes = [
+            (pid, rng.randint(0, 30), rng.randint(1, 20)) for pid in range(1, 13)
+        ]
+        self.assertTrue(fails(self.processes))
+
+    def test_reaches_minimum(self):
+        shrunk = Shrinker(fails).shrink(self.processes)
+        self.assertEqual(len(shrunk), 2)
+        self.assertEqual([pid for pid, _, _ in shrunk], [1, 2])
+        self.assertEqual([a for _, a, _ in shrunk], [0, 0])
+        self.assertEqual(sorted(b for _, _, b in shrunk), [1, 7])
+
+    def test_tries_each_candidate_once(self):
+        seen = []
+
+        def counted(processes):
+            seen.append(processes)
+            return fails(processes)
+
+        shrinker = Shrinker(counted, jobs=4)
+        shrinker.shrink(self.processes)
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), shrinker.tried)
+
+    def test_same_result_with_jobs(self):
+        alone = Shrinker(fails).shrink(self.processes)
+        self.assertEqual(Shrinker(fails, jobs=8).shrink(self.processes), alone)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import random
+import itertools
+import unittest
+from timingstats import TimingSummary, percentile, signed_rank_p_value
+
+
+class PercentileTest(unittest.TestCase):
+    def test_interpolates(self):
+        ordered = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.assertEqual(percentile(ordered, 0.0), 1.0)
+        self.assertEqual(percentile(ordered, 0.5), 3.0)
+        self.assertAlmostEqual(percentile(ordered, 0.95), 4.8)
+        self.assertEqual(percentile(ordered, 1.0), 5.0)
+        self.assertEqual(percentile([7.0], 0.95), 7.0)
+
+
+class TimingSummaryTest(unittest.TestCase):
+    def test_known_samples(self):
+        summary = TimingSummary([3.0, 1.0, 5.0, 2.0, 4.0])
+        self.assertEqual(summary.count, 5)
+        self.assertEqual(summary.min, 1.0)
+        self.assertEqual(summary.median, 3.0)
+        self.assertEqual(summary.mean, 3.0)
+        self.assertAlmostEqual(summary.p95, 4.8)
+        self.assertAlmostEqual(summary.stddev, 1.5811388300841898)
+        self.assertEqual(summary.outliers, [])
+
+    def test_confidence_interval(self):
+        samples = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0]
+        summary = TimingSummary(samples)
+        self.assertLess(summary.ci_low, summary.mean)
+        self.assertGreater(summary.ci_high, summary.mean)
+        self.assertGreaterEqual(summary.ci_low, summary.min)
+        self.assertLessEqual(summary.ci_high, max(samples))
+
+        # the resamples are seeded, so the same samples give the same interval
+        again = TimingSummary(list(reversed(samples)))
+        self.assertEqual(
+            (again.ci_low, again.ci_high), (summary.ci_low, summary.ci_high)
+        )
+
+    def test_constant_samples(self):
+        summary = TimingSummary([2.0] * 10)
+        self.assertEqual((summary.ci_low, summary.ci_high), (2.0, 2.0))
+        self.assertEqual(summary.stddev, 0.0)
+        self.assertEqual(summary.outliers, [])
+
+    def test_single_sample(self):
+        summary = TimingSummary([2.5])
+        self.assertEqual((summary.ci_low, summary.ci_high), (2.5, 2.5))
+        self.assertEqual(summary.stddev, 0.0)
+
+    def test_outliers(self):
+        summary = TimingSummary([1.0, 1.1, 1.2, 1.0, 1.1, 9.0])
+        self.assertEqual(summary.outliers, [9.0])
+
+    def test_no_samples(self):
+        with self.assertRaises(ValueError):
+            TimingSummary([])
+
+
+def brute_force_p_value(differences: list[float]) -> float:
+    # every way of flipping the signs is as likely when nothing changed
+    kept = [d for d in differences if d != 0]
+    ordered = sorted(abs(d) for d in kept)
+    rank = {v: (2 * ordered.index(v) + ordered.count(v) + 1) / 2 for v in ordered}
+    ranks = [rank[abs(d)] for d in kept]
+    observed = sum(r for r, d in zip(ranks, kept) if d > 0)
+    flips = list(itertools.product((0, 1), repeat=len(ranks)))
+    larger = sum(1 for f in flips if sum(r * s for r, s in zip(ranks, f)) >= observed)
+    return larger / len(flips)
+
+
+class SignedRankTest(unittest.TestCase):
+    def test_known_values(self):
+        self.assertEqual(signed_rank_p_value([1.0, 2.0, 3.0, 4.0, 5.0]), 1 / 32)
+        self.assertEqual(signed_rank_p_value([-1.0, -2.0, -3.0]), 1.0)
+        self.assertEqual(signed_rank_p_value([0.0, 0.0]), 1.0)
+        self.assertEqual(signed_rank_p_value([]), 1.0)
+
+    def test_exact_with_ties_and_zeros(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            differences = [rng.choice([-2, -1, 0, 1, 1, 2, 3]) for _ in range(10)]
+            self.assertAlmostEqual(
+                signed_rank_p_value(differences), brute_force_p_value(differences)
+            )
+
+    def test_normal_approximation(self):
+        rng = random.Random(1)
+        for _ in range(10):
+            differences = [rng.gauss(0.2, 1.0) for _ in range(40)]
+            exact = signed_rank_p_value(differences)
+            approximate = signed_rank_p_value(differences, exact_limit=0)
+            self.assertAlmostEqual(exact, approximate, delta=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import math
+import random
+import statistics
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Value below which fraction of the sorted samples fall, interpolating
+    linearly between the closest two."""
+    position = (len(ordered) - 1) * fraction
+    below = int(position)
+    above = min(below + 1, len(ordered) - 1)
+    return ordered[below] + (ordered[above] - ordered[below]) * (position - below)
+
+
+def signed_rank_p_value(differences: list[float], exact_limit: int = 50) -> float:
+    """One-sided p-value of the Wilcoxon signed-rank test that paired
+    differences tend to be positive. Zero differences are dropped and ties
+    share the average of their ranks. It is exact up to exact_limit pairs
+    and uses the normal approximation corrected for ties past that."""
+    ordered = sorted((abs(d), d > 0) for d in differences if d != 0)
+    n = len(ordered)
+    if not n:
+        return 1.0
+
+    # ranks are doubled so that the average rank of ties stays an integer
+    ranks = []
+    start = 0
+    while start < n:
+        end = start
+        while end + 1 < n and ordered[end + 1][0] == ordered[start][0]:
+            end += 1
+        ranks.extend([start + end + 2] * (end - start + 1))
+        start = end + 1
+    observed = sum(r for r, (_, positive) in zip(ranks, ordered) if positive)
+
+    if n <= exact_limit:
+        # counts[w] is how many of the 2^n sign flips give a doubled sum of w
+        counts = [1] + [0] * sum(ranks)
+        for r in ranks:
+            for w in range(len(counts) - 1, r - 1, -1):
+                counts[w] += counts[w - r]
+        return sum(counts[observed:]) / 2**n
+
+    mean = n * (n + 1) / 2
+    variance = sum(r * r for r in ranks) / 16
+    z = (observed / 2 - mean / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+class TimingSummary:
+    """Statistics of the repeated timings of one case, in seconds.
+
+    The confidence interval is the one of the mean, bootstrapped from
+    RESAMPLES resamples with a fixed seed so a report can be compared with
+    the next one. Outliers are the samples beyond OUTLIER_FENCE interquartile
+    ranges from the quartiles (Tukey's fences), which is where a run that got
+    preempted or hit a cold cache usually lands.
+    """
+
+    __slots__ = (
+        "count",
+        "min",
+        "median",
+        "mean",
+        "p95",
+        "stddev",
+        "ci_low",
+        "ci_high",
+        "outliers",
+    )
+
+    CONFIDENCE = 0.95
+    RESAMPLES = 1000
+    OUTLIER_FENCE = 1.5
+
+    def __init__(self, samples: list[float]) -> None:
+        if not samples:
+            raise ValueError("no samples to summarize")
+
+        ordered = sorted(samples)
+        self.count = len(ordered)
+        self.min = ordered[0]
+        self.median = statistics.median(ordered)
+        self.mean = statistics.fmean(ordered)
+        self.p95 = percentile(ordered, 0.95)
+        self.stddev = statistics.stdev(ordered) if self.count > 1 else 0.0
+        self.ci_low, self.ci_high = self.__bootstrap(ordered)
+
+        q1, q3 = percentile(ordered, 0.25), percentile(ordered, 0.75)
+        fence = TimingSummary.OUTLIER_FENCE * (q3 - q1)
+        self.outliers = [s for s in samples if s < q1 - fence or s > q3 + fence]
+
+    def __bootstrap(self, ordered: list[float]) -> tuple[float, float]:
+        if self.count == 1:
+            return (self.mean, self.mean)
+
+        rng = random.Random(0)
+        means = sorted(
+            statistics.fmean(rng.choices(ordered, k=self.count))
+            for _ in range(TimingSummary.RESAMPLES)
+        )
+        tail = (1 - TimingSummary.CONFIDENCE) / 2
+        return (percentile(means, tail), percentile(means, 1 - tail))
@@ -1,17 +1,38 @@
 import os
 import re
+import sys
 import time
-import tempfile
+import asyncio
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import oracle
+import childusage
+from childusage import ChildUsage
+from executors import AsyncioExecutor, ExecutorOptions, make_executor
+from payloads import PayloadStore
+from shrinker import Shrinker
+from suitecache import SuiteCache
+from timingstats import TimingSummary
 
 
 class PrintableReport:
     def __init__(self, test_path: str) -> None:
         self.__test_path = test_path
+        self.__notes: list[tuple[str, str]] = []
 
     @property
     def suite_name(self) -> str:
         return f"./{os.path.relpath(self.__test_path)}"
 
+    def add_note(self, label: str, value: str):
+        self.__notes.append((label, value))
+
+    def format_notes(self, colsize: int) -> list[str]:
+        return [f"{label:<{colsize - 1}} {value}" for label, value in self.__notes]
+
     def print_report(self, report_lines: list[str]):
         print()
         print("-" * 40)
@@ -37,24 +58,46 @@ class TestResults(PrintableReport):
         COLSIZE = 8
         out_report = []
         out_report.append(f"{'suite:':<{COLSIZE}}{self.suite_name}")
-        out_report.append(f"{'score:':<{COLSIZE}}{passed}/{total}\n")
+        out_report.append(f"{'score:':<{COLSIZE}}{passed}/{total}")
+        out_report.extend(self.format_notes(COLSIZE))
+        out_report[-1] += "\n"
         super().print_report(out_report)
 
 
 class ProfilerStats(PrintableReport):
+    """Wall time and resource usage of every run of the program."""
+
     def __init__(self, test_path: str) -> None:
         super().__init__(test_path)
-        self.__start = None
         self.__records: list[float] = []
-
-    def start(self):
-        self.__start = time.time()
-
-    def record(self):
-        if self.__start is None:
-            raise RuntimeError("Cannot call end before start")
-        self.__records.append(time.time() - self.__start)
-        self.__start = None
+        self.__usages: list[ChildUsage] = []
+        self.__cases: dict[tuple, list[float]] = dict()
+        self.__calibrated = False
+        self.overhead = None
+        self.empty_run = None
+
+    def start(self) -> tuple:
+        childusage.take()  # forget runs that were not timed
+        return (time.perf_counter_ns(), ChildUsage.children())
+
+    def record(self, start: tuple, case: tuple = None):
+        elapsed = time.perf_counter_ns() - start[0]
+        # without a usage kept by the callback, overlapping runs get mixed up
+        usage = childusage.take() or ChildUsage.children().since(start[1])
+        self.__records.append(elapsed / 1e9)
+        self.__usages.append(usage)
+        if case is not None:
+            self.__cases.setdefault(case, []).append(elapsed / 1e9)
+
+    def take_case(self, case: tuple) -> list[float]:
+        """Returns the times recorded under case and forgets them."""
+        return self.__cases.pop(case, [])
+
+    def calibrate(self, overhead: float = None, empty_run: float = None):
+        """Sets the median times of a no-op program and of an empty payload."""
+        self.__calibrated = True
+        self.overhead = overhead
+        self.empty_run = empty_run
 
     def total_time(self):
         return sum(self.__records)
@@ -72,7 +115,99 @@ class ProfilerStats(PrintableReport):
         out_report.append(
             f"{'average time:':<{COLSIZE}}{1000 * self.average_time()} ms"
         )
-        out_report.append(f"{'total time:':<{COLSIZE}}{1000 * self.total_time()} ms\n")
+        out_report.append(f"{'total time:':<{COLSIZE}}{1000 * self.total_time()} ms")
+        out_report.extend(self.format_usage(COLSIZE))
+        if self.__calibrated:
+            out_report.extend(self.format_calibration(COLSIZE))
+        out_report.extend(self.format_notes(COLSIZE))
+        out_report[-1] += "\n"
+        super().print_report(out_report)
+
+    def format_calibration(self, colsize: int) -> list[str]:
+        ms = lambda value: "n/a" if value is None else f"{1000 * value:.3f} ms"
+        out_report = [
+            f"{'overhead:':<{colsize}}{ms(self.overhead)} per run (no-op program)",
+            f"{'empty run:':<{colsize}}{ms(self.empty_run)} per run (no processes)",
+        ]
+
+        if self.overhead is not None:
+            runs = len(self.__records)
+            average = self.average_time() - self.overhead
+            total = self.total_time() - self.overhead * runs
+            out_report.append(
+                f"{'corrected:':<{colsize}}{ms(average)} average, {ms(total)} total"
+            )
+        return out_report
+
+    def format_usage(self, colsize: int) -> list[str]:
+        usages = self.__usages
+        runs = len(usages) or 1
+        user = sum(u.user for u in usages)
+        sys = sum(u.sys for u in usages)
+        maxrss = max((u.maxrss for u in usages if u.maxrss is not None), default=None)
+
+        return [
+            f"{'runs:':<{colsize}}{len(usages)}",
+            f"{'user cpu:':<{colsize}}{1000 * user:.3f} ms"
+            + f" ({1000 * user / runs:.3f} ms per run)",
+            f"{'system cpu:':<{colsize}}{1000 * sys:.3f} ms"
+            + f" ({1000 * sys / runs:.3f} ms per run)",
+            f"{'max rss:':<{colsize}}" + ("n/a" if maxrss is None else f"{maxrss} KiB"),
+            f"{'page faults:':<{colsize}}"
+            + f"{sum(u.minflt for u in usages)} minor,"
+            + f" {sum(u.majflt for u in usages)} major",
+            f"{'ctx switches:':<{colsize}}"
+            + f"{sum(u.nvcsw for u in usages)} voluntary,"
+            + f" {sum(u.nivcsw for u in usages)} involuntary",
+        ]
+
+
+class MatrixReport(PrintableReport):
+    """Side by side score and timings of the suite run by several builds."""
+
+    def __init__(self, test_path: str) -> None:
+        super().__init__(test_path)
+        self.__builds = []
+
+    def add_build(self, name: str, result: TestResults, timings: ProfilerStats):
+        self.__builds.append((name, result, timings))
+
+    def add_failed_build(self, name: str):
+        self.__builds.append((name, None, None))
+
+    def print_report(self):
+        md_table = [("build", "score", "status", "average", "total", "speedup")]
+        md_format = ("L", "R", "L", "R", "R", "R")
+        baseline = None
+
+        for name, result, timings in self.__builds:
+            if result is None:
+                md_table.append((name, "n/a", "no build", "n/a", "n/a", "n/a"))
+                continue
+
+            passed, total = result.give_score()
+            total_time = timings.total_time()
+            baseline = baseline or total_time
+            md_table.append(
+                (
+                    name,
+                    f"{passed}/{total}",
+                    "pass" if passed == total else "FAIL",
+                    f"{1000 * timings.average_time():.3f} ms",
+                    f"{1000 * total_time:.1f} ms",
+                    f"{baseline / total_time:.2f}x" if total_time else "n/a",
+                )
+            )
+
+        print()
+        print("\n".join(TesterBase.make_md_table(md_table, md_format)))
+
+        COLSIZE = 8
+        out_report = []
+        out_report.append(f"{'suite:':<{COLSIZE}}{self.suite_name}")
+        out_report.append(f"{'builds:':<{COLSIZE}}{len(self.__builds)}")
+        out_report.extend(self.format_notes(COLSIZE))
+        out_report[-1] += "\n"
         super().print_report(out_report)
 
 
@@ -81,63 +216,450 @@ class NullReport(PrintableReport):
         pass  # nothing to do here
 
 
+class Section:
+    """A test case of the suite, parsed once when it is loaded."""
+
+    __slots__ = ("payload", "quanta", "waits", "responses", "generator", "sweep")
+
+    def __init__(
+        self,
+        payload: bytes,
+        quanta: tuple,
+        waits: array,
+        responses: array,
+        generator: tuple,
+    ) -> None:
+        self.payload = payload
+        self.quanta = quanta
+        self.waits = waits
+        self.responses = responses
+        self.generator = generator
+        self.sweep = tuple(sys.intern(q) for q in ",".join(generator).split(","))
+
+    @classmethod
+    def from_blocks(cls, payload: list[str], results: list[str], generator: list[str]):
+        quanta: list[str] = []
+        waits = array("d")
+        responses = array("d")
+
+        for row in results:
+            qval, avgwait, avgresp = row.split(",")
+            quanta.append(sys.intern(qval))
+            waits.append(float(avgwait))
+            responses.append(float(avgresp))
+
+        blob = "".join(s + "\n" for s in payload).encode()
+        return cls(blob, tuple(quanta), waits, responses, tuple(generator))
+
+    def payload_lines(self) -> list[str]:
+        return self.payload.decode().split("\n")[:-1]
+
+
 class TesterBase:
     PAYLOAD = "payload"
     RESULTS = "results"
     GENERATOR = "generator"
     TAB = "  "
 
-    def __init__(self, test_path: str, callback, *args):
+    # state: (prefix of the line that leaves the state, next state)
+    FSM = {
+        None: ("# ", "title"),
+        "title": ("## ", "section"),
+        "section": ("```", PAYLOAD),
+        PAYLOAD: ("```", "payload-end"),
+        "payload-end": ("```", RESULTS),
+        RESULTS: ("```", "results-end"),
+        "results-end": ("```", GENERATOR),
+        GENERATOR: ("```", "generator-end"),
+        "generator-end": ("## ", "section"),
+    }
+    WHITELIST = re.compile(r"^$|\*[\w ]+\*|^>")
+    HEADING = re.compile(r"^#+ ")
+    SHARE_RUNS = True
+    MAX_SHARED_RUNS = 1 << 16
+    BATCH_RUNS = True
+
+    def __init__(
+        self,
+        test_path: str,
+        callback,
+        *args,
+        cache=None,
+        suite_cache_dir=None,
+        shrink=False,
+    ):
         self.__callback = callback
         self.__args = args
-        self.__ttree: dict[str, dict[str, dict[str, list[str]]]] = dict()
+        self.__cache = cache
         self.__test_path = test_path
-        self.__key_map = []
+        self.__pool = None
+        self.__jobs = 1
+        self.shrink = shrink
+        self.__payloads = PayloadStore()
+        self.__runs: OrderedDict[tuple, Future] = OrderedDict()
+        self.__runs_lock = threading.Lock()
+        self.__reused = 0
+        self.__suite_cache = None
+
+        if suite_cache_dir is not None:
+            self.__suite_cache = SuiteCache(suite_cache_dir, test_path)
+
+    def iter_suite(self, index: list = None):
+        """Yields (title, None) and (name, section) pairs, filling index if any."""
+        with open(self.__test_path, "rb") as file:
+            yield from self.__parse(file, None, index)
+
+    def __parse(self, file, state, index: list = None, single: bool = False):
+        FSM = TesterBase.FSM
+        whitelist = TesterBase.WHITELIST.match
+        names: set[str] = set()  # sections seen under the current title
+        section: dict = None
+        content: list[str] = None  # lines of the open code block, if any
+        offset = file.tell()
+
+        for raw in file:
+            line = raw.decode().rstrip("\r\n")
+            line_offset, offset = offset, offset + len(raw)
+
+            if content is not None and line != "```":
+                content.append(line)
+                continue
+
+            if whitelist(line.rstrip()):
+                continue  # ignore line
+
+            prefix, next_state = FSM[state]
+            if not line.startswith(prefix):
+                raise SyntaxError(
+                    f"Incorrectly formatted test cases. It failed at:" + f"`{line}'"
+                )
+            state = next_state
+
+            if state == "title":
+                names.clear()
+                if index is not None:
+                    index.append((line, None))
+                yield (line, None)
+            elif state == "section":
+                self.validate_uniqueness(names, line)
+                names.add(line)
+                if index is not None:
+                    index.append((line, line_offset))
+                name, section = line, dict()
+            elif content is None:
+                content = section[state] = []
+            else:
+                content = None
+                if state == "generator-end":
+                    yield (name, self.__make_section(name, section))
+                    if single:
+                        return
+
+        if state not in (None, "title", "generator-end"):
+            raise SyntaxError(
+                f"Incorrectly formatted test cases. It ended in:" + f"`{name}'"
+            )
 
-        state = None
-        whitelist = re.compile(r"^$|\*[\w ]+\*|^>")
+    def __make_section(self, name: str, blocks: dict[str, list[str]]) -> Section:
+        try:
+            return Section.from_blocks(
+                blocks[TesterBase.PAYLOAD],
+                blocks[TesterBase.RESULTS],
+                blocks[TesterBase.GENERATOR],
+            )
+        except ValueError:
+            raise SyntaxError(
+                f"Incorrectly formatted results. It failed in:" + f"`{name}'"
+            )
+
+    def iter_sections(self, section_filter: set[str] = set()):
+        """Same as iter_suite, through the suite cache if there is one."""
+        if self.__suite_cache is None:
+            yield from self.iter_suite()
+            return
+
+        index = self.__suite_cache.load_index() if section_filter else None
+        if index is not None:
+            yield from self.__seek_sections(index, section_filter)
+            return
+
+        records = None if section_filter else self.__suite_cache.load()
+        if records is not None:
+            yield from records
+            return
+
+        index = []
+        snapshot = self.__suite_cache.snapshot()
+        with self.__suite_cache.writer(snapshot) as writer:
+            for record in self.iter_suite(index):
+                writer.add(record)
+                yield record
+        self.__suite_cache.save_index(index, snapshot)
+
+    def __seek_sections(self, index: list, section_filter: set[str]):
+        with open(self.__test_path, "rb") as file:
+            for name, offset in index:
+                if offset is None:
+                    yield (name, None)
+                elif not self.is_filtered(name, section_filter):
+                    file.seek(offset)
+                    yield from self.__parse(file, "title", single=True)
 
-        with open(test_path) as file:
-            for line in file:
-                lnw = line.rstrip("\n")
-                lsp = line.rstrip()
+    def callback(self, prog_arg: str, quantum_size: str, *args):
+        key, output = self.__lookup(prog_arg, quantum_size)
+        if output is not None:
+            return output
 
-                if self.update_sections(state, lnw):
-                    continue
+        if asyncio.iscoroutinefunction(self.__callback):
+            output = asyncio.run(self.__callback(prog_arg, quantum_size, *self.__args))
+        else:
+            output = self.__callback(prog_arg, quantum_size, *self.__args)
 
-                if whitelist.match(lsp):
-                    continue  # ignore line
+        return self.__store(key, output)
 
-                state = self.advance_fsm(state, lnw)
+    async def acallback(self, prog_arg: str, quantum_size: str, *args):
+        key, output = self.__lookup(prog_arg, quantum_size)
+        if output is not None:
+            return output
 
-    def callback(self, prog_arg: str, quantum_size: str, *args):
-        return self.__callback(prog_arg, quantum_size, *self.__args)
+        if asyncio.iscoroutinefunction(self.__callback):
+            output = await self.__callback(prog_arg, quantum_size, *self.__args)
+        else:
+            # usage kept by the callback belongs to the worker thread, so it
+            # is moved over to this one along with the output
+            loop = asyncio.get_running_loop()
+            output, usage = await loop.run_in_executor(
+                None, self.__call_and_take, prog_arg, quantum_size
+            )
+            childusage.keep(usage)
+
+        return self.__store(key, output)
+
+    def __call_and_take(self, prog_arg: str, quantum_size: str) -> tuple:
+        output = self.__callback(prog_arg, quantum_size, *self.__args)
+        return (output, childusage.take())
+
+    def __lookup(self, prog_arg: str, quantum_size: str) -> tuple:
+        if self.__cache is None:
+            return (None, None)
+
+        with open(prog_arg, "rb") as file:
+            key = self.__cache.key(file.read(), quantum_size, *self.__args)
+        return (key, self.__cache.get(key))
+
+    def __store(self, key, output: str) -> str:
+        if key is not None:
+            self.__cache.put(key, output)
+        return output
+
+    def payload_file(self, payload: bytes):
+        """Context manager giving a path the program can read payload from."""
+        return self.__payloads.open(payload)
+
+    def run_payload(self, payload: bytes, quanta: list[str], *args) -> list[tuple]:
+        """Same as run_quanta for a payload given by its content."""
+        if not self.SHARE_RUNS:
+            with self.payload_file(payload) as payload_path:
+                return self.run_quanta(payload_path, quanta, *args)
+
+        # sections that share a payload share its runs too
+        digest = hashlib.sha256(payload).digest()
+        owned: list[tuple[str, Future]] = []
+        futures: list[Future] = []
+
+        with self.__runs_lock:
+            for q in quanta:
+                key = (digest, q, args)
+                if key not in self.__runs:
+                    self.__runs[key] = Future()
+                    owned.append((q, self.__runs[key]))
+                else:
+                    # counts quanta run again by the same section too
+                    self.__reused += 1
+                    self.__runs.move_to_end(key)
+                futures.append(self.__runs[key])
+
+            # forgetting a run only stops later sharing, waiters keep theirs
+            while len(self.__runs) > self.MAX_SHARED_RUNS:
+                self.__runs.popitem(last=False)
+
+        # runs owned here are settled before waiting on the ones owned by
+        # other sections, which is what keeps sections from waiting in a cycle
+        outcomes: list[tuple] = []
+        try:
+            if owned:
+                with self.payload_file(payload) as payload_path:
+                    outcomes = self.run_quanta(
+                        payload_path, [q for q, _ in owned], *args
+                    )
+        except BaseException as err:
+            outcomes = [(None, err)] * len(owned)
+            raise
+        finally:
+            for (_, future), outcome in zip(owned, outcomes):
+                future.set_result(outcome)
+
+        return [future.result() for future in futures]
+
+    def run_quanta(self, prog_arg: str, quanta: list[str], *args) -> list[tuple]:
+        """Calls back once per quantum and returns (output, error) pairs."""
+        # batch callbacks are handed every quantum at once
+        if self.BATCH_RUNS and hasattr(self.__callback, "batch"):
+            return self.__batch(prog_arg, quanta)
+
+        if self.__pool is None:
+            return [self.__collect(self.callback, prog_arg, q, *args) for q in quanta]
+
+        if isinstance(self.__pool, AsyncioExecutor):
+            call = self.acallback
+        else:
+            call = self.callback
+
+        futures = [self.__pool.submit(call, prog_arg, q, *args) for q in quanta]
+        return [self.__collect(future.result) for future in futures]
+
+    def __batch(self, prog_arg: str, quanta: list[str]) -> list[tuple]:
+        lookups = [self.__lookup(prog_arg, q) for q in quanta]
+        outcomes = [(output, None) for _, output in lookups]
+        missing = [i for i, (_, output) in enumerate(lookups) if output is None]
+        if not missing:
+            return outcomes
+
+        try:
+            outputs = self.__callback.batch(
+                prog_arg, [quanta[i] for i in missing], *self.__args
+            )
+        except Exception as err:
+            outputs = [err] * len(missing)
+
+        for i, output in zip(missing, outputs):
+            if isinstance(output, Exception):
+                outcomes[i] = (None, output)
+            else:
+                outcomes[i] = (self.__store(lookups[i][0], output), None)
+
+        return outcomes
+
+    def __collect(self, fn, *args) -> tuple:
+        try:
+            return (fn(*args), None)
+        except Exception as err:
+            return (None, err)
+
+    def read_averages(self, output: str) -> tuple[str, str]:
+        lines = output.split("\n")
+        return (lines[0].split(":")[1].strip(), lines[1].split(":")[1].strip())
+
+    def compare_with_reference(self, processes: list[tuple], quanta, outcomes):
+        """Reference results for quanta and what the program did where they differ."""
+        results: list[str] = []
+        differ: dict[str, str] = dict()
+
+        for qval, (cl_result, err) in zip(quanta, outcomes):
+            expected = oracle.format_output(*oracle.simulate(processes, int(qval)))
+            avgwait, avgresp = self.read_averages(expected)
+            results.append(f"{qval}, {avgwait}, {avgresp}")
+
+            if err is not None:
+                differ[qval] = f"crashed: {str(err)}"
+                continue
+
+            try:
+                testAvgWaitTime, testAvgRespTime = self.read_averages(cl_result)
+                passed = float(testAvgWaitTime) == float(avgwait)
+                passed = passed and float(testAvgRespTime) == float(avgresp)
+            except (IndexError, ValueError):
+                testAvgWaitTime, testAvgRespTime = "?", "?"
+                passed = False
+
+            if not passed:
+                differ[qval] = (
+                    f"received {testAvgWaitTime}, {testAvgRespTime}"
+                    + f" but expected {avgwait}, {avgresp}"
+                )
+
+        return (results, differ)
+
+    def make_section_lines(
+        self,
+        payload_lines: list[str],
+        results: list[str],
+        generator: list[str],
+        differ: dict[str, str] = {},
+    ) -> list[str]:
+        """Lines of a section body in the format of the test file."""
+        prog_out: list[str] = []
+
+        if differ:  # quoted lines are skipped by the parser
+            prog_out.extend(f"> quantum {q}: {msg}" for q, msg in differ.items())
+            prog_out.append("")
+        prog_out.append("*payload*")
+        prog_out.append("```")
+        prog_out.extend(payload_lines)
+        prog_out.append("```")
+        prog_out.append("")
+        prog_out.append("*results*")
+        prog_out.append("```")
+        prog_out.extend(results)
+        prog_out.append("```")
+        prog_out.append("")
+        prog_out.append("*generator*")
+        prog_out.append("```")
+        prog_out.extend(generator)
+        prog_out.append("```")
+        prog_out.append("")
+
+        return prog_out
+
+    def shrink_payload(self, payload: bytes, quanta) -> list[str]:
+        """Smallest payload the program still gets wrong as a section, or None."""
+        quanta = tuple(quanta)
+
+        def differ(processes, quanta):
+            outcomes = self.run_payload(oracle.format_payload(processes), quanta)
+            return self.compare_with_reference(processes, quanta, outcomes)[1]
+
+        try:
+            processes = oracle.parse_payload(payload.decode())
+        except ValueError:
+            return None
+
+        failing = differ(processes, quanta) if processes else None
+        if not failing:
+            return None
+
+        first = (next(iter(failing)),)
+        shrinker = Shrinker(lambda p: bool(differ(p, first)), self.__jobs)
+        processes = shrinker.shrink(processes)
+        payload = oracle.format_payload(processes)
+        outcomes = self.run_payload(payload, quanta)
+        results, failing = self.compare_with_reference(processes, quanta, outcomes)
+
+        # a flaky program may pass the last run, the section is still useful
+        kept = [i for i, q in enumerate(quanta) if q in failing] or range(len(quanta))
+        return self.make_section_lines(
+            payload.decode().split("\n")[:-1],
+            [results[i] for i in kept],
+            [",".join(quanta[i] for i in kept)],
+            failing,
+        )
 
-    def validate_uniqueness(self, item: dict, key: str):
+    def validate_uniqueness(self, item, key: str):
         if key in item:
             nice_path = os.path.relpath(self.__test_path)
             raise SystemExit(f"`{key}' is a duplicate entry in {nice_path}")
 
-    def add_level(self, active_item: dict, key: str, payload):
-        self.validate_uniqueness(active_item, key)
-        active_item[key] = payload
-        self.__key_map.append(active_item[key])
-
-    def add_item(self, active_item: dict, key: str, payload):
-        self.validate_uniqueness(active_item, key)
-        active_item[key] = payload
-
-    def run_section(self, unit: dict[str, list[str]]) -> tuple[bool, list[str]]:
+    def run_section(self, unit: Section) -> tuple[bool, list[str]]:
         raise NotImplementedError("run_section must be derived")
 
     def is_filtered(self, key: str, filter: set[str]):
         if len(filter) == 0:
             return False
-        remove_hash = re.compile(r"^#+ ")
-        key = remove_hash.sub("", key).lower()
+        key = TesterBase.HEADING.sub("", key).lower()
         return key not in filter
 
-    def make_md_table(self, entries: list[tuple], alignment: tuple[str], indentation=0):
+    @staticmethod
+    def make_md_table(entries: list[tuple], alignment: tuple[str], indentation=0):
         if not entries:
             return []
 
@@ -189,175 +711,210 @@ class TesterBase:
         table_out[0], table_out[1] = table_out[1], table_out[0]
         return table_out
 
-    def run_tests(self, section_filter: set[str], verbose: bool):
+    def run_tests(
+        self,
+        section_filter: set[str],
+        verbose: bool,
+        jobs: int = 1,
+        executor: str = ExecutorOptions.DEFAULT,
+    ):
         self._verbose = verbose
-        print_buffer: list[str] = []
+        self.__jobs = jobs
         section_filter = {i.lower() for i in section_filter}
 
-        for name, title in self.__ttree.items():
-            print_buffer.append(name)
-            for name, section in title.items():
-                if self.is_filtered(name, section_filter):
-                    continue
-
-                passed, msg = self.run_section(section)
-
-                if passed and not verbose:
-                    continue
-
-                print_buffer.append(name)
-                print_buffer.extend(msg)
-
-        if print_buffer[-1] == "":
-            print_buffer.pop()
-
-        print("\n".join(print_buffer))
-
-    def update_sections(self, state, line):
-        if line == "```":
-            return False
-
-        if state == "payload" or state == "results" or state == "generator":
-            self.__key_map[-1][state].append(line)
-            return True
-
-        else:
-            return False
-
-    def advance_fsm(self, state, line):
-        FSM = {
-            None: [(r"^# ", "title")],
-            "title": [(r"^## ", "section")],
-            "section": [(r"^```", "payload")],
-            "payload": [(r"^```", "payload-end")],
-            "payload-end": [(r"^```", "results")],
-            "results": [(r"^```", "results-end")],
-            "results-end": [(r"^```", "generator")],
-            "generator": [(r"^```", "generator-end")],
-            "generator-end": [(r"^## ", "section")],
-        }
-
-        entry_state = state
-        for target, next in FSM[state]:
-            if re.match(target, line):
-                state = next
-
-        if entry_state == state:
-            raise SyntaxError(
-                f"Incorrectly formatted test cases. It failed at:" + f"`{line}'"
-            )
-
-        if state == "title" and entry_state == None:
-            self.__ttree[line] = dict()
-            self.__key_map.append(self.__ttree[line])
-
-        elif state == "section" and entry_state == "title":
-            self.add_level(self.__key_map[-1], line, dict())
-
-        elif state == "section" and entry_state == "generator-end":
-            self.__key_map.pop()
-            self.add_level(self.__key_map[-1], line, dict())
-
-        elif state == "payload" or state == "results" or state == "generator":
-            self.add_item(self.__key_map[-1], state, [])
-
-        elif (
-            state == "payload-end" or state == "results-end" or state == "generator-end"
-        ):
-            pass  # nothing to do here
-
-        else:
-            raise SyntaxError(
-                f"Fatal error at:" + f"`{line}'.\nInvalid state transition."
-            )
-
-        return state
+        # sections are independent so they are dispatched to a pool as soon
+        # as they are parsed. Only a window of them is in flight and reports
+        # are printed in suite order as the oldest ones finish, so memory
+        # stays flat no matter how large the suite is. Quanta go to an
+        # executor of their own so that a section never waits on a worker
+        # that is itself waiting on a section.
+        window = 2 * jobs
+        pending = deque()
+        printer = self.__printer()
+        next(printer)
+
+        try:
+            with ThreadPoolExecutor(max_workers=jobs) as pool, make_executor(
+                executor, jobs
+            ) as self.__pool:
+                for name, section in self.iter_sections(section_filter):
+                    if section is None:
+                        pending.append((name, None))
+                    elif not self.is_filtered(name, section_filter):
+                        job = pool.submit(self.run_section, section)
+                        pending.append((name, job))
+
+                    while len(pending) > window:
+                        self.__report(printer, *pending.popleft())
+
+                while pending:
+                    self.__report(printer, *pending.popleft())
+        finally:
+            printer.close()
+            self.__pool = None
+            self.__payloads.close()
+
+        if self.__cache is not None:
+            hits, lookups = self.__cache.hits, self.__cache.lookups
+            self.result.add_note("cache:", f"{hits}/{lookups} runs reused")
+
+        if self.SHARE_RUNS and self.__reused:
+            self.result.add_note("shared:", f"{self.__reused} runs reused")
+
+    def __report(self, printer, name: str, job):
+        if job is None:
+            printer.send(name)
+            return
+
+        passed, msg = job.result()
+
+        if passed and not self._verbose:
+            return
+
+        printer.send(name)
+        for line in msg:
+            printer.send(line)
+
+    def __printer(self):
+        # holds one line back so a trailing blank line is never printed
+        held = None
+        try:
+            while True:
+                line = yield
+                if held is not None:
+                    print(held)
+                held = line
+        finally:
+            if held:
+                print(held)
 
 
 class UnitTester(TesterBase):
-    def __init__(self, test_path: str, callback, *args):
-        super().__init__(test_path, callback, *args)
+    def __init__(self, test_path: str, callback, *args, passed=None, **options):
+        super().__init__(test_path, callback, *args, **options)
         self.result = TestResults(test_path)
+        self.__args = args
+        self.__passed = passed
+        self.__skipped = 0
+        self.__skipped_lock = threading.Lock()
+
+    def run_tests(self, *args, **kwargs):
+        super().run_tests(*args, **kwargs)
+        if self.__skipped:
+            self.result.add_note(
+                "skipped:", f"{self.__skipped} sections unchanged since they passed"
+            )
+
+    def section_key(self, unit: Section) -> str:
+        return self.__passed.key(
+            unit.payload,
+            ",".join(unit.quanta).encode(),
+            unit.waits.tobytes(),
+            unit.responses.tobytes(),
+            *(a.encode() for a in self.__args),
+        )
 
     def trim_output(self, received: str):
         if received.endswith("\n"):
             received = received[:-1]
         return received
 
-    def run_section(self, unit: dict[str, list[str]]):
-        payload = unit[TesterBase.PAYLOAD]
-        cases = (tuple(test.split(",")) for test in unit[TesterBase.RESULTS])
-        generator = ",".join(unit[TesterBase.GENERATOR])
-        generator = generator.split(",")
+    def run_section(self, unit: Section):
+        key = None
+        if self.__passed is not None:
+            key = self.section_key(unit)
+            if key in self.__passed:
+                with self.__skipped_lock:
+                    self.__skipped += 1
+                self.result.add_entry(True)
+                return (True, ["Skipped, unchanged since it last passed.", ""])
+
+        cases = zip(unit.quanta, unit.waits, unit.responses)
 
         INDENT_LEVEL = 0
         passed_all = True
         prog_out: list[str] = []
 
-        with tempfile.NamedTemporaryFile() as test_file:
-            test_file.writelines(str.encode(s + "\n") for s in payload)
-            test_file.flush()
-
-            md_table = [("qm", "average", "received", "expected", "status")]
-            md_format = ("R", "L", "R", "R", "L")
-            err_iter = 0
-
-            for qval, avgwait, avgresp in cases:
-                try:
-                    cl_result: str = self.callback(test_file.name, qval)
-                except Exception as err:
-                    passed_all = False
-                    err_iter += 1
-                    md_table.append(
-                        (qval, "none", "crashed", "n/a", f"see error {err_iter}")
-                    )
-                    prog_out.append(
-                        TesterBase.TAB * INDENT_LEVEL
-                        + f"{err_iter}. Crashed "
-                        + f"(quantum={qval}): {str(err)}"
-                    )
-                    continue
-
-                lines = cl_result.split("\n")
-                testAvgWaitTime = float(lines[0].split(":")[1])
-                testAvgRespTime = float(lines[1].split(":")[1])
-                status_msg = ""
-
-                passed = True
-                if testAvgWaitTime != float(avgwait):
-                    status_msg = "FAIL"
-                    passed_all = passed = False
-                else:
-                    status_msg = "pass"
-
-                if self._verbose or not passed:
-                    md_table.append(
-                        (qval, "wait", testAvgWaitTime, float(avgwait), status_msg)
-                    )
-
-                passed = True
-                if testAvgRespTime != float(avgresp):
-                    status_msg = "FAIL"
-                    passed_all = passed = False
-                else:
-                    status_msg = "pass"
-
-                if self._verbose or not passed:
-                    md_table.append(
-                        (qval, "response", testAvgRespTime, float(avgresp), status_msg)
-                    )
+        md_table = [("qm", "average", "received", "expected", "status")]
+        md_format = ("R", "L", "R", "R", "L")
+        err_iter = 0
+        failed_quanta: list[str] = []
+
+        outcomes = self.run_payload(unit.payload, unit.quanta)
+
+        for (qval, avgwait, avgresp), (cl_result, err) in zip(cases, outcomes):
+            if err is not None:
+                passed_all = False
+                err_iter += 1
+                failed_quanta.append(qval)
+                md_table.append(
+                    (qval, "none", "crashed", "n/a", f"see error {err_iter}")
+                )
+                prog_out.append(
+                    TesterBase.TAB * INDENT_LEVEL
+                    + f"{err_iter}. Crashed "
+                    + f"(quantum={qval}): {str(err)}"
+                )
+                continue
+
+            lines = cl_result.split("\n")
+            testAvgWaitTime = float(lines[0].split(":")[1])
+            testAvgRespTime = float(lines[1].split(":")[1])
+            status_msg = ""
+
+            if testAvgWaitTime != avgwait or testAvgRespTime != avgresp:
+                failed_quanta.append(qval)
+
+            passed = True
+            if testAvgWaitTime != avgwait:
+                status_msg = "FAIL"
+                passed_all = passed = False
+            else:
+                status_msg = "pass"
+
+            if self._verbose or not passed:
+                md_table.append((qval, "wait", testAvgWaitTime, avgwait, status_msg))
+
+            passed = True
+            if testAvgRespTime != avgresp:
+                status_msg = "FAIL"
+                passed_all = passed = False
+            else:
+                status_msg = "pass"
+
+            if self._verbose or not passed:
+                md_table.append(
+                    (qval, "response", testAvgRespTime, avgresp, status_msg)
+                )
 
         if err_iter:
             prog_out.append("")
         prog_out.extend(self.make_md_table(md_table, md_format, INDENT_LEVEL))
         prog_out.append("")
+
+        if not passed_all and self.shrink:
+            shrunk = self.shrink_payload(unit.payload, failed_quanta)
+            if shrunk is None:
+                prog_out.append(
+                    "Not shrunk, the program agrees with the reference scheduler"
+                    + " (oracle.py) on this payload."
+                )
+                prog_out.append("")
+            else:
+                prog_out.append("Smallest payload that still fails:")
+                prog_out.append("")
+                prog_out.extend(shrunk)
+
+        if passed_all and key is not None:
+            self.__passed.add(key)
+
         self.result.add_entry(passed_all)
         return (passed_all, prog_out)
 
 
 class ResultGenerator(TesterBase):
-    def __init__(self, test_path: str, callback, *args):
-        super().__init__(test_path, callback, *args)
+    def __init__(self, test_path: str, callback, *args, **options):
+        super().__init__(test_path, callback, *args, **options)
         self.result = NullReport(test_path)
 
     def trim_output(self, received: str):
@@ -365,88 +922,227 @@ class ResultGenerator(TesterBase):
             received = received[:-1]
         return received
 
-    def run_section(self, unit: dict[str, list[str]]):
-        payload = unit[TesterBase.PAYLOAD]
-        generator = ",".join(unit[TesterBase.GENERATOR])
-        generator = generator.split(",")
+    def run_section(self, unit: Section):
+        generator = unit.sweep
         prog_out: list[str] = []
 
         prog_out.append("*payload*")
         prog_out.append("```")
-        prog_out.extend(unit[TesterBase.PAYLOAD])
+        prog_out.extend(unit.payload_lines())
         prog_out.append("```")
         prog_out.append("")
         prog_out.append("*results*")
         prog_out.append("```")
 
-        with tempfile.NamedTemporaryFile() as test_file:
-            test_file.writelines(str.encode(s + "\n") for s in payload)
-            test_file.flush()
-
-            for qval in generator:
-                try:
-                    cl_result: str = self.callback(test_file.name, qval)
-                except Exception as err:
-                    prog_out.append(f"Crashed (quantum={qval}): {str(err)}")
-                    continue
-                lines = cl_result.split("\n")
-                testAvgWaitTime = lines[0].split(":")[1]
-                testAvgRespTime = lines[1].split(":")[1]
-                prog_out.append(f"{qval}, {testAvgWaitTime}, {testAvgRespTime}")
+        outcomes = self.run_payload(unit.payload, generator)
+
+        for qval, (cl_result, err) in zip(generator, outcomes):
+            if err is not None:
+                prog_out.append(f"Crashed (quantum={qval}): {str(err)}")
+                continue
+            lines = cl_result.split("\n")
+            testAvgWaitTime = lines[0].split(":")[1]
+            testAvgRespTime = lines[1].split(":")[1]
+            prog_out.append(f"{qval}, {testAvgWaitTime}, {testAvgRespTime}")
 
         prog_out.append("```")
         prog_out.append("")
         prog_out.append("*generator*")
         prog_out.append("```")
-        prog_out.extend(unit[TesterBase.GENERATOR])
+        prog_out.extend(unit.generator)
         prog_out.append("```")
         prog_out.append("")
 
         return (False, prog_out)
 
 
-class BatchRun(TesterBase):
-    def __init__(self, test_path: str, callback, *args):
-        super().__init__(test_path, callback, *args)
-        self.result = ProfilerStats(test_path)
+class TimedRuns:
+    """Mixed into a tester to time every run of the program in self.timings."""
+
+    # runs are neither shared nor batched so that each one is timed
+    SHARE_RUNS = False
+    BATCH_RUNS = False
+    RECORD_CASES = False
+    repeat = 1
+    warmup = 0
+
+    def callback(self, prog_arg: str, quantum_size: str, *args):
+        for _ in range(self.warmup):
+            super().callback(prog_arg, quantum_size, *args)
+
+        case = (quantum_size, *args) if self.RECORD_CASES else None
+        for _ in range(self.repeat):
+            started = self.timings.start()
+            try:
+                output = super().callback(prog_arg, quantum_size, *args)
+            except BaseException:
+                self.timings.record(started)
+                raise
+            self.timings.record(started, case)
+        return output
+
+    async def acallback(self, prog_arg: str, quantum_size: str, *args):
+        for _ in range(self.warmup):
+            await super().acallback(prog_arg, quantum_size, *args)
+
+        case = (quantum_size, *args) if self.RECORD_CASES else None
+        for _ in range(self.repeat):
+            started = self.timings.start()
+            try:
+                output = await super().acallback(prog_arg, quantum_size, *args)
+            except BaseException:
+                self.timings.record(started)
+                raise
+            self.timings.record(started, case)
+        return output
+
+
+class BatchRun(TimedRuns, TesterBase):
+    RECORD_CASES = True
+    CALIBRATION_RUNS = 20
+    EMPTY_PAYLOAD = b"0\n"
+
+    def __init__(
+        self,
+        test_path: str,
+        callback,
+        *args,
+        repeat=1,
+        warmup=0,
+        history=None,
+        **options,
+    ):
+        super().__init__(test_path, callback, *args, **options)
+        self.result = self.timings = ProfilerStats(test_path)
+        self.repeat = repeat
+        self.warmup = warmup
+        self.__history = history
+        self.__names: dict[Section, str] = dict()
+        self.__outliers = 0
+        self.__outliers_lock = threading.Lock()
+
+    def run_tests(self, *args, **kwargs):
+        super().run_tests(*args, **kwargs)
+        if self.repeat > 1:
+            self.result.add_note(
+                "repeat:", f"{self.repeat} timed runs per quantum, {self.warmup} warmup"
+            )
+            self.result.add_note("outliers:", f"{self.__outliers} runs")
+
+    def calibrate(self, noop: "BatchRun" = None, executor=ExecutorOptions.DEFAULT):
+        """Times a no-op program and an empty payload the way the suite is."""
+        runs = max(self.repeat, BatchRun.CALIBRATION_RUNS)
+        with self.payload_file(BatchRun.EMPTY_PAYLOAD) as payload_path:
+            overhead = None
+            if noop is not None:
+                overhead = noop.probe(payload_path, runs, executor)
+            empty_run = self.probe(payload_path, runs, executor)
+        self.timings.calibrate(overhead, empty_run)
+
+    def probe(self, prog_arg: str, runs: int, executor=ExecutorOptions.DEFAULT):
+        """Median time of runs of prog_arg out of the report, or None if it fails."""
+        timings, repeat = self.timings, self.repeat
+        self.timings, self.repeat = ProfilerStats(""), runs
+        try:
+            if executor == ExecutorOptions.ASYNCIO:
+                asyncio.run(self.acallback(prog_arg, "1", "calibration"))
+            else:
+                self.callback(prog_arg, "1", "calibration")
+            return TimingSummary(self.timings.take_case(("1", "calibration"))).median
+        except Exception:
+            return None
+        finally:
+            self.timings, self.repeat = timings, repeat
+
+    def iter_sections(self, section_filter: set[str] = set()):
+        # sections only get their name back for the history
+        for name, section in super().iter_sections(section_filter):
+            named = section is not None and self.__history is not None
+            if named and not self.is_filtered(name, section_filter):
+                self.__names[section] = name
+            yield (name, section)
 
     def trim_output(self, received: str):
         if received.endswith("\n"):
             received = received[:-1]
         return received
 
-    def run_section(self, unit: dict[str, list[str]]):
-        payload = unit[TesterBase.PAYLOAD]
-        generator = ",".join(unit[TesterBase.GENERATOR])
-        generator = generator.split(",")
+    def run_section(self, unit: Section):
+        generator = unit.sweep
         prog_out: list[str] = []
+        name = self.__names.pop(unit, None)
 
-        with tempfile.NamedTemporaryFile() as test_file:
-            test_file.writelines(str.encode(s + "\n") for s in payload)
-            test_file.flush()
+        md_table = [("pid", "arrival", "burst")]
+        md_table.extend(p.split(",") for p in unit.payload_lines()[1:])
+        md_format = ("R", "R", "R")
+        prog_out.extend(self.make_md_table(md_table, md_format))
+        prog_out.append("")
 
-            md_table = [("pid", "arrival", "burst")]
-            md_table.extend(p.split(",") for p in payload[1:])
-            md_format = ("R", "R", "R")
-            prog_out.extend(self.make_md_table(md_table, md_format))
+        # tells the timings of this section apart from any other running
+        case = f"{id(unit):x}"
+        outcomes = self.run_payload(unit.payload, generator, case)
+        summaries = []
+
+        for qval, (cl_result, err) in zip(generator, outcomes):
+            samples = self.timings.take_case((qval, case))
+            if err is not None:
+                prog_out.append(f"Crashed (quantum={qval}): {str(err)}")
+                continue
+
+            if samples and name is not None:
+                self.__history.add_timings(name, qval, samples)
+            if samples and self.repeat > 1:
+                summaries.append((qval, TimingSummary(samples)))
+            lines = cl_result.split("\n")
+            if lines[-1] == "":
+                lines.pop()
+            prog_out.append(f"### Run with quantum {qval}")
+            prog_out.append("```")
+            prog_out.extend(lines)
+            prog_out.append("```")
             prog_out.append("")
 
-            for qval in generator:
-                try:
-                    self.result.start()
-                    cl_result: str = self.callback(test_file.name, qval, "1")
-                except Exception as err:
-                    prog_out.append(f"Crashed (quantum={qval}): {str(err)}")
-                    continue
-                finally:
-                    self.result.record()
-                lines = cl_result.split("\n")
-                if lines[-1] == "":
-                    lines.pop()
-                prog_out.append(f"### Run with quantum {qval}")
-                prog_out.append("```")
-                prog_out.extend(lines)
-                prog_out.append("```")
-                prog_out.append("")
+        if summaries:
+            prog_out.extend(self.make_timing_lines(summaries))
 
         return (False, prog_out)
+
+    def make_timing_lines(self, summaries: list[tuple]) -> list[str]:
+        md_table = [
+            ("quantum", "min", "median", "mean", "p95", "stddev", "95% ci", "outliers")
+        ]
+        md_format = ("R", "R", "R", "R", "R", "R", "R", "R", "R")
+        ms = lambda value: f"{1000 * value:.3f}"
+        overhead = self.timings.overhead
+        if overhead is not None:
+            md_table[0] += ("corrected median",)
+
+        for qval, summary in summaries:
+            row = (
+                qval,
+                ms(summary.min),
+                ms(summary.median),
+                ms(summary.mean),
+                ms(summary.p95),
+                ms(summary.stddev),
+                f"{ms(summary.ci_low)}-{ms(summary.ci_high)}",
+                str(len(summary.outliers)),
+            )
+            if overhead is not None:
+                row += (ms(summary.median - overhead),)
+            md_table.append(row)
+            with self.__outliers_lock:
+                self.__outliers += len(summary.outliers)
+
+        prog_out = ["### Timings (ms)"]
+        prog_out.extend(self.make_md_table(md_table, md_format))
+        prog_out.append("")
+        return prog_out
+
+
+class BenchRun(TimedRuns, UnitTester):
+    """UnitTester that also times every run, used to compare builds."""
+
+    def __init__(self, test_path: str, callback, *args, **options):
+        super().__init__(test_path, callback, *args, **options)
+        self.timings = ProfilerStats(test_path)